@@ -0,0 +1,578 @@
+"""
+Benchmarks of the pricing / calibration hot paths.
+
+    python benchmark.py run --out before.json
+    python benchmark.py run --quick --only crr --out after.json
+    python benchmark.py compare before.json after.json
+    python benchmark.py imports
+    python benchmark.py check
+
+Each case is timed (best of a few runs) and run once more under
+tracemalloc for the peak memory (numpy allocations included). Cases
+with a reference value also record their absolute pricing error, for
+time-to-accuracy comparisons (e.g. accuracy.american_put.crr against
+accuracy.american_put.trinomial).
+compare exits with status 1 if a case got slower / bigger than the
+threshold, so it can be used before upgrading.
+
+imports checks the import-time budget: each module (and a pricing run
+through BinomialTree, HoLee, BlackDermanToy, Option_IR) is imported in
+a fresh interpreter, must take less than the budget on top of numpy and
+must not load scipy, pandas or matplotlib (exit status 1 otherwise).
+
+check compares the pruned American engine (early exercise boundary,
+crr.BinomialTree._prune) with the unpruned one over a grid of
+contracts (exit status 1 on a difference).
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+CASES = {}  # name: (setup, sizes, quick sizes, reference)
+
+
+def case(name, sizes, quick, reference=None):
+    """
+    Register a benchmark: setup(size) returns the callable to time
+    (setup cost itself not measured). If reference() is given, the
+    callable returns a price and its error |price - reference()| is
+    recorded.
+    """
+    def register(setup):
+        CASES[name] = (setup, sizes, quick, reference)
+        return setup
+    return register
+
+
+def _param():
+    from option_param import Parameters
+
+    return Parameters(100, 100, 0, 1, 0.05, 0.0, 0.2)
+
+
+def _curve(n, T=10.0):
+    """
+    Synthetic upward sloping ZCB curve with n maturities up to T years
+    """
+    times = T / n * np.arange(1, n + 1)
+    return np.exp(-(0.02 + 0.002 * times) * times), T
+
+
+# -------------------- crr.py --------------------
+
+def _tree(n, price_only, style):
+    from crr import BinomialTree
+
+    param = _param()
+
+    def run():
+        tree = BinomialTree(param, n, price_only=price_only)
+        if not price_only:
+            tree.set_tree()
+        if style == "european":
+            tree.set_european()
+        else:
+            tree.set_american()
+    return run
+
+
+@case("crr.european", (10, 100, 1000, 2000), (10, 100, 500))
+def crr_european(n):
+    return _tree(n, False, "european")
+
+
+@case("crr.american", (10, 100, 1000, 2000), (10, 100, 500))
+def crr_american(n):
+    return _tree(n, False, "american")
+
+
+@case("crr.european.price_only", (10, 100, 1000, 10000, 50000), (10, 100, 1000))
+def crr_european_price_only(n):
+    return _tree(n, True, "european")
+
+
+@case("crr.american.price_only", (10, 100, 1000, 10000, 50000), (10, 100, 1000))
+def crr_american_price_only(n):
+    return _tree(n, True, "american")
+
+
+@case("crr.american.price_only.deep_itm", (10, 100, 1000, 6000), (10, 100, 1000))
+def crr_american_deep_itm(n):
+    """
+    Put deep in the money (K = 2 S): the pruned engine only steps the
+    few rows above the exercise boundary
+    """
+    from crr import BinomialTree
+    from option_param import Parameters
+
+    param = Parameters(100, 200, 0, 1, 0.05, 0.0, 0.2)
+
+    def run():
+        BinomialTree(param, n, price_only=True).set_american()
+    return run
+
+
+@case("crr.american.price_only.unpruned", (10, 100, 1000, 6000), (10, 100, 1000))
+def crr_american_unpruned(n):
+    """
+    Reference for the pruning gain: every node stepped (_prune off)
+    """
+    from crr import BinomialTree
+
+    param = _param()
+
+    def run():
+        tree = BinomialTree(param, n, price_only=True)
+        tree._prune = lambda: False
+        tree.set_american()
+    return run
+
+
+@case("crr.chain.american", (10, 100, 1000, 10000), (10, 100))
+def crr_chain(m):
+    """
+    m contracts (strikes x vols), 200 timestep
+    """
+    from crr import BinomialChain
+
+    strike = np.linspace(50, 150, m)
+    vol = np.resize([0.15, 0.2, 0.3, 0.4], m)
+
+    def run():
+        BinomialChain(100, strike, 0, 1, 0.05, 0.0, vol, 200).set_american()
+    return run
+
+
+# -------------------- trinomial.py --------------------
+
+def _trinomial(n, price_only, style):
+    from trinomial import TrinomialTree
+
+    param = _param()
+
+    def run():
+        tree = TrinomialTree(param, n, price_only=price_only)
+        if style == "european":
+            tree.set_european()
+        else:
+            tree.set_american()
+    return run
+
+
+@case("trinomial.american", (10, 100, 1000, 2000), (10, 100, 500))
+def trinomial_american(n):
+    return _trinomial(n, False, "american")
+
+
+@case("trinomial.american.price_only", (10, 100, 1000, 10000), (10, 100, 1000))
+def trinomial_american_price_only(n):
+    return _trinomial(n, True, "american")
+
+
+_REFERENCE = {}
+
+
+def _american_put():
+    """
+    Reference American put: price-only CRR with 10000 / 10001 timestep
+    averaged (odd / even oscillation), computed once
+    """
+    if "american_put" not in _REFERENCE:
+        from crr import BinomialTree
+
+        prices = []
+        for n in (10000, 10001):
+            tree = BinomialTree(_param(), n, price_only=True)
+            tree.set_american()
+            prices.append(tree.am_p)
+        _REFERENCE["american_put"] = np.mean(prices)
+    return _REFERENCE["american_put"]
+
+
+@case("accuracy.american_put.crr", (25, 50, 100, 200, 400, 800), (25, 100),
+      reference=_american_put)
+def accuracy_crr(n):
+    from crr import BinomialTree
+
+    param = _param()
+
+    def run():
+        tree = BinomialTree(param, n, price_only=True)
+        tree.set_american()
+        return tree.am_p
+    return run
+
+
+@case("accuracy.american_put.trinomial", (25, 50, 100, 200, 400, 800), (25, 100),
+      reference=_american_put)
+def accuracy_trinomial(n):
+    from trinomial import TrinomialTree
+
+    param = _param()
+
+    def run():
+        tree = TrinomialTree(param, n, price_only=True)
+        tree.set_american()
+        return tree.am_p
+    return run
+
+
+# -------------------- short_interest_rate.py --------------------
+
+def _calibration(model, n, method):
+    import short_interest_rate as sir
+
+    zcb, T = _curve(n)
+    cls = getattr(sir, model)
+    sigma = 0.01 if model == "HoLee" else 0.2
+
+    return lambda: cls(zcb, T, sigma, method=method)
+
+
+@case("HoLee.fit_theta.fsolve", (10, 25, 50), (10, 25))
+def holee_fsolve(n):
+    return _calibration("HoLee", n, "fsolve")
+
+
+@case("HoLee.fit_theta.forward", (10, 50, 200, 1000), (10, 50))
+def holee_forward(n):
+    return _calibration("HoLee", n, "forward")
+
+
+@case("BlackDermanToy.fit_theta.fsolve", (10, 25, 50), (10, 25))
+def bdt_fsolve(n):
+    return _calibration("BlackDermanToy", n, "fsolve")
+
+
+@case("BlackDermanToy.fit_theta.forward", (10, 50, 200, 1000), (10, 50))
+def bdt_forward(n):
+    return _calibration("BlackDermanToy", n, "forward")
+
+
+def _option_ir(n):
+    """
+    Option_IR with n timestep on a calibrated BDT curve
+    """
+    from short_interest_rate import BlackDermanToy, Option_IR
+
+    zcb, T = _curve(n + 1)
+    bdt = BlackDermanToy(zcb, T, 0.2, method="forward")
+    return Option_IR(bdt, T * n / (n + 1), n)
+
+
+@case("Option_IR.option", (10, 100, 500, 1000), (10, 100))
+def option_ir(n):
+    option = _option_ir(n)
+    return lambda: option.option(option.c_swap, 100.0, "cap")
+
+
+@case("Option_IR.swaption", (10, 100, 500, 1000), (10, 100))
+def swaption(n):
+    option = _option_ir(n)
+    return lambda: option.swaption(n // 2)
+
+
+# -------------------- binomial_plot.py --------------------
+
+@case("GraphTree.real_tree", (10, 100, 1000), (10, 100))
+def graph_tree(n):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    from crr import BinomialTree
+    from binomial_plot import GraphTree
+
+    tree = BinomialTree(_param(), n)
+    tree.set_tree()
+
+    def run():
+        graph = GraphTree(tree.t_stock)
+        graph.real_tree()
+        graph.fig.canvas.draw()
+        plt.close(graph.fig)
+    return run
+
+
+# -------------------- import time --------------------
+
+IMPORT_BUDGET = 0.15  # seconds per module, on top of the numpy import
+
+HEAVY = ("scipy", "pandas", "matplotlib")  # loaded on first use only
+
+IMPORTS = {
+    "crr": "import crr",
+    "trinomial": "import trinomial",
+    "short_interest_rate": "import short_interest_rate",
+    "implied_vol": "import implied_vol",
+    "binomial_plot": "from binomial_plot import GraphTree",
+    "portfolio": "import portfolio",
+    "store": "import store",
+    "streaming": "import streaming",
+    "pricing": """
+import numpy as np
+from option_param import Parameters
+from crr import BinomialTree
+from short_interest_rate import HoLee, BlackDermanToy, Option_IR
+tree = BinomialTree(Parameters(100, 100, 0, 1, 0.05, 0.0, 0.2), 50)
+tree.set_american()
+zcb = np.exp(-0.03 * np.arange(1, 11))
+Option_IR(HoLee(zcb, 10, 0.01), 9, 9).option(0.03, 100.0, "cap")
+Option_IR(BlackDermanToy(zcb, 10, 0.2), 9, 9).option(0.03, 100.0, "cap")
+""",
+}
+
+_IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import numpy
+middle = time.perf_counter()
+exec(sys.argv[1])
+end = time.perf_counter()
+heavy = sorted({m.split(".")[0] for m in sys.modules} & set(sys.argv[2:]))
+print(json.dumps({"numpy": middle - start, "time": end - middle, "heavy": heavy}))
+"""
+
+
+def measure_import(code, repeat=5):
+    """
+    Best time (s) of code in a fresh interpreter, after numpy is
+    imported, and the heavy modules it loaded
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", _IMPORT_SCRIPT, code, *HEAVY],
+                             cwd=root, capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout))
+
+    return {"time": min(r["time"] for r in runs),
+            "numpy": min(r["numpy"] for r in runs),
+            "heavy": runs[0]["heavy"]}
+
+
+def check_imports(budget=IMPORT_BUDGET, repeat=5):
+    """
+    Import every module of IMPORTS in a fresh interpreter
+    ==============================
+    Returns:
+        list: names over budget or loading a heavy module
+    """
+    failures = []
+    print("{:24} {:>10} {:>10}  {}".format("import", "time", "numpy", "heavy"))
+    for name, code in IMPORTS.items():
+        result = measure_import(code, repeat)
+
+        flag = ""
+        if result["time"] > budget or result["heavy"]:
+            failures.append(name)
+            flag = "  <-- over budget" if result["time"] > budget else "  <-- heavy"
+        print("{:24} {:>8.3f} s {:>8.3f} s  {}{}".format(
+            name, result["time"], result["numpy"], ",".join(result["heavy"]), flag))
+
+    return failures
+
+
+# -------------------- pruning check --------------------
+
+def check_pruning(tol=1e-10):
+    """
+    American call / put of the pruned engine against the unpruned one
+    (_prune forced False), price only and full tree, first 3 columns
+    included (Greeks)
+    ==============================
+    Returns:
+        list: contracts (and mode) whose prices differ by more than tol
+    """
+    from crr import BinomialTree
+    from option_param import Parameters
+
+    failures = []
+    for n in (1, 2, 3, 10, 101, 500):
+        for strike in (50, 90, 100, 110, 200):
+            for rate, dividend, vol in ((0.05, 0.0, 0.2), (0.0, 0.0, 0.3),
+                                        (0.1, 0.0, 0.05), (0.05, 0.03, 0.2),
+                                        (-0.01, 0.0, 0.2)):
+                param = Parameters(100, strike, 0, 1, rate, dividend, vol)
+                for price_only in (True, False):
+                    pruned = BinomialTree(param, n, price_only=price_only)
+                    full = BinomialTree(param, n, price_only=price_only)
+                    full._prune = lambda: False
+                    pruned.set_american()
+                    full.set_american()
+
+                    a = [pruned.am_c, pruned.am_p]
+                    b = [full.am_c, full.am_p]
+                    if n >= 2:
+                        for name in ("am_c", "am_p"):
+                            a += list(np.concatenate(pruned._first_columns(name)))
+                            b += list(np.concatenate(full._first_columns(name)))
+
+                    error = np.max(np.abs(np.subtract(a, b)))
+                    if not error <= tol:
+                        failures.append((n, strike, rate, dividend, vol, price_only))
+                        print("n={} K={} r={} q={} vol={} price_only={}: {:.3e}".format(
+                            *failures[-1], error))
+
+    print("{} differences".format(len(failures)))
+    return failures
+
+
+# -------------------- runner --------------------
+
+def measure(func, repeat=5, budget=1.0):
+    """
+    Best wall time (s) over up to repeat runs (stops once budget seconds
+    are spent) and peak traced memory (bytes) of one extra run
+    """
+    times = []
+    while len(times) < repeat and sum(times) < budget:
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {"time": min(times), "times": times, "peak_bytes": peak}
+
+
+def _metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+
+    return {"commit": commit,
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform()}
+
+
+def run(only=(), quick=False, repeat=5, budget=1.0, out=None):
+    """
+    Run the cases whose name starts with one of only (all by default)
+    ==============================
+    Returns:
+        dict: {"meta": {...}, "results": [{"name", "size", "time",
+               "times", "peak_bytes"(, "error")}, ...]}
+    """
+    results = []
+    for name, (setup, sizes, quick_sizes, reference) in CASES.items():
+        if only and not name.startswith(tuple(only)):
+            continue
+
+        for size in (quick_sizes if quick else sizes):
+            func = setup(size)
+            result = dict(name=name, size=size, **measure(func, repeat, budget))
+            line = "{:36} {:>7} {:>12.6f} s {:>10.1f} MiB".format(
+                name, size, result["time"], result["peak_bytes"] / 2**20)
+
+            if reference is not None:
+                result["error"] = abs(float(func()) - reference())
+                line += " {:>12.3e} err".format(result["error"])
+
+            results.append(result)
+            print(line)
+
+    report = {"meta": _metadata(), "results": results}
+    if out is not None:
+        with open(out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    return report
+
+
+def compare(old, new, threshold=1.2):
+    """
+    Print new / old ratios of time and peak memory per (case, size)
+    ==============================
+    Args:
+        old, new (str): JSON files written by run
+        threshold (float): ratio above which a case is a regression
+
+    Returns:
+        list: (name, size) of the regressions
+    """
+    with open(old) as f:
+        old = {(r["name"], r["size"]): r for r in json.load(f)["results"]}
+    with open(new) as f:
+        new = {(r["name"], r["size"]): r for r in json.load(f)["results"]}
+
+    regressions = []
+    print("{:36} {:>7} {:>9} {:>9}".format("case", "size", "time", "memory"))
+    for key in old:
+        if key not in new:
+            continue
+        a, b = old[key], new[key]
+        t = b["time"] / a["time"]
+        m = b["peak_bytes"] / a["peak_bytes"] if a["peak_bytes"] else 1.0
+
+        flag = ""
+        if t > threshold or m > threshold:
+            regressions.append(key)
+            flag = "  <-- regression"
+        print("{:36} {:>7} {:>8.2f}x {:>8.2f}x{}".format(*key, t, m, flag))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("run", help="run the benchmarks")
+    p.add_argument("--only", nargs="*", default=(), help="case name prefixes")
+    p.add_argument("--quick", action="store_true", help="small sizes only")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--budget", type=float, default=1.0,
+                   help="seconds spent timing each case (at least one run)")
+    p.add_argument("--out", help="JSON output file")
+
+    p = commands.add_parser("compare", help="compare two JSON results")
+    p.add_argument("old")
+    p.add_argument("new")
+    p.add_argument("--threshold", type=float, default=1.2)
+
+    p = commands.add_parser("imports", help="check the import-time budget")
+    p.add_argument("--budget", type=float, default=IMPORT_BUDGET,
+                   help="seconds per module on top of numpy")
+    p.add_argument("--repeat", type=int, default=5)
+
+    commands.add_parser("check", help="check the pruned American engine")
+
+    commands.add_parser("list", help="list the cases")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        run(args.only, args.quick, args.repeat, args.budget, args.out)
+    elif args.command == "compare":
+        return 1 if compare(args.old, args.new, args.threshold) else 0
+    elif args.command == "imports":
+        return 1 if check_imports(args.budget, args.repeat) else 0
+    elif args.command == "check":
+        return 1 if check_pruning() else 0
+    else:
+        for name, (_, sizes, quick, _) in CASES.items():
+            print("{:36} {} (quick: {})".format(name, sizes, quick))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,103 +1,157 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
+
+import instrument
+
+# matplotlib is imported by _plot / _save only: importing this module
+# (or building a GraphTree) does not load it
 
 
 class GraphTree:
     """
-    Plot Binomial Tree.
-    
-    data_tree: nxn numpy array or DataFrame
+    Plot Binomial (or Trinomial) Tree.
 
-    up_color(optional): str color of an up move 
+    data_tree: nxn numpy array, DataFrame or TriangularLattice
+        ((2n-1)xn numpy array if branches = 3, e.g. TrinomialTree.t_stock)
+
+    up_color(optional): str color of an up move
     down_color(optional): str color of an down move
+    mid_color(optional): str color of a middle move (branches = 3)
+    branches (optional): 2 (binomial, row j of column i: j down moves)
+        or 3 (trinomial, row j of column i: i - j net up moves)
     text_color (optional): str color of text
+    max_nodes (optional): above this number of nodes, only one column
+        (and row) out of k is drawn, k chosen to stay below max_nodes
+    max_labels (optional): no node label above this number of nodes drawn
+
+    All up moves are drawn as a single LineCollection (same for middle
+    and down moves). Once plotted, the figure is in obj.fig and can be saved with
+    obj.real_tree(path="tree.png") (figure then closed).
     """
     def __init__(self, data_tree, up_color = "salmon",
                  down_color = "cornflowerblue", text_color = "black",
-                 fig_size = (16,8)):
+                 fig_size = (16,8), max_nodes = 5000, max_labels = 300,
+                 mid_color = "darkgrey", branches = 2):
 
-        self.data_tree = data_tree #
+        if branches not in (2, 3):
+            raise ValueError("branches must be 2 (binomial) or 3 (trinomial)")
+
+        self.data_tree = np.asarray(data_tree, dtype=float) # dense nxn / (2n-1)xn
         self.up_color = up_color
         self.down_color = down_color
+        self.mid_color = mid_color
+        self.branches = branches
         self.text_color = text_color
         self.fig_size = fig_size # tuple
-        
-    
-    def real_tree(self):
-        """
-        Real Tree ==> Price proportional to distance
-        """
+        self.max_nodes = max_nodes
+        self.max_labels = max_labels
 
-        plt.subplots(figsize=self.fig_size) # useful for outpub in jupyternotebook
-        tree = self.data_tree
-        n = len(tree)
-        
-        
-        #TODO: Vectorise plot?
-        for i in range(n-1):
-            for j in range(n-1):
-                if j <= i:
+        self.fig = None
+        self.ax = None
 
-                    plt.plot([i,i+1], [tree[j,i],tree[j+1,i+1]],
-                             color= self.down_color)
-
-                    plt.plot([i,i+1], [tree[j,i],tree[j,i+1]],
-                             color = self.up_color)
-
-                    plt.text(i-0.15, tree[j, i], s = str(round(tree[j, i],4)),
-                             color = self.text_color, zorder=10)
+    def step(self):
+        """
+        Level of detail: draw one column (and row) out of k
+        """
+        n = self.data_tree.shape[1]
+        k = 1
+        while self._nodes(n // k) > self.max_nodes:
+            k += 1
+        return k
 
-        for j in range(n):
+    def _nodes(self, m):
+        """
+        Number of nodes of a tree with m columns
+        """
+        return m + (self.branches - 1) * m * (m - 1) / 2
 
-            plt.text(n-1.15, tree[j,-1], s = str(round(tree[j,-1],4)),
-                     color = self.text_color)
-            
-        # Legend - Manually inputted
-        down = mpatches.Patch(color=self.down_color, label='down movement')
-        up = mpatches.Patch(color=self.up_color, label='up movement')
+    @instrument.timed
+    def real_tree(self, path = None):
+        """
+        Real Tree ==> Price proportional to distance
+        """
+        self._plot(self.data_tree)
 
-        plt.legend(handles=[up, down])
+        if path is not None:
+            self._save(path)
 
-    def fake_tree(self):
+    @instrument.timed
+    def fake_tree(self, path = None):
         """
         Method that plot "Aesthetic tree".
         Aesthetic <==> up move = down move
-        In other word, price position is not proportional to the actual price. 
+        In other word, price position is not proportional to the actual price.
         """
+        rows, n = self.data_tree.shape
 
-        plt.subplots(figsize=self.fig_size) # useful for outpub in jupyternotebook
-        plt.gca().axes.yaxis.set_ticklabels([]) # Remove y-axis (confusing otherwise!)
-
-        tree = self.data_tree
-        n = len(tree)
+        # Fake Tree for aesthetic purposes: row j of column i at
+        # 100 + 10 i - 20 j (binomial) / 100 + 10 i - 10 j (trinomial)
+        i, j = np.arange(n), np.arange(rows)
+        tree_f = 100 + 10 * i[None, :] - 20 / (self.branches - 1) * j[:, None]
 
-        # Fake Tree for aesthetic purposes
-        tree_f = np.zeros((n,n)) #(n+1) ?
-        tree_f[0,:] = 100 + np.arange(n) * 10 # Vectorise first row
-        
-        for i in range(n-1,0,-1):
-            tree_f[1:i+1,i] = tree_f[0,i] - 20 * np.arange(1,i+1) # vectorise each column 
-                    
+        self._plot(tree_f)
+        self.ax.yaxis.set_ticklabels([]) # Remove y-axis (confusing otherwise!)
 
-        for i in range(n-1):
-            for j in range(n-1):
-                if j <= i:
-                    plt.plot([i, i+1], [tree_f[j, i],tree_f[j+1, i+1]],
-                             color= self.down_color,zorder=2)
+        if path is not None:
+            self._save(path)
 
-                    plt.plot([i, i+1], [tree_f[j, i],tree_f[j, i+1]],
-                             color = self.up_color,zorder=1)
-
-                    plt.text(i-0.15, tree_f[j, i], s = str(round(self.data_tree[j, i], 4)),
+    def _plot(self, y):
+        """
+        Draw the tree: node (j, i) at (i, y[j, i]), labelled with
+        data_tree[j, i]
+        """
+        import matplotlib.pyplot as plt
+        import matplotlib.patches as mpatches
+        from matplotlib.collections import LineCollection
+
+        self.fig, self.ax = plt.subplots(figsize=self.fig_size) # useful for outpub in jupyternotebook
+
+        k = self.step()
+        b = self.branches
+        cols = np.arange(0, y.shape[1], k) # columns drawn
+        m = len(cols)
+
+        # nodes (row, column) of the coarse tree: j <= (b - 1) i
+        jj, ii = self._coarse_nodes(m - 1)
+        j, i = jj * k, cols[ii]
+        start = np.column_stack((i, y[j, i]))
+
+        # move o: row j + o k of the next coarse column (0 = up, b - 1 = down)
+        colors = [self.up_color] + [self.mid_color] * (b - 2) + [self.down_color]
+        for o in range(b - 1, -1, -1):
+            end = np.column_stack((i + k, y[j + o * k, i + k]))
+            self.ax.add_collection(LineCollection(np.stack((start, end), axis=1),
+                                                  colors=colors[o]))
+        self.ax.autoscale_view()
+
+        if self._nodes(m) <= self.max_labels:
+            jj, ii = self._coarse_nodes(m)
+            for j, i in zip(jj * k, cols[ii]):
+                self.ax.text(i - 0.15 * k, y[j, i], s = str(round(self.data_tree[j, i], 4)),
                              color = self.text_color, zorder=10)
 
-        for j in range(n):
-            plt.text(n-1.15, tree_f[j, -1], s = str(round(tree[j,-1],4)),
-                     color = self.text_color)
-        
         # Legend - Manually inputted
         down = mpatches.Patch(color=self.down_color, label='down movement')
         up = mpatches.Patch(color=self.up_color, label='up movement')
+        handles = [up, down]
+        if b == 3:
+            handles.insert(1, mpatches.Patch(color=self.mid_color, label='middle movement'))
+
+        self.ax.legend(handles=handles)
+
+    def _coarse_nodes(self, m):
+        """
+        (rows, columns) of the nodes of the first m coarse columns
+        """
+        sizes = (self.branches - 1) * np.arange(m) + 1 # rows per column
+        ii = np.repeat(np.arange(m), sizes)
+        jj = np.arange(len(ii)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        return jj, ii
+
+    def _save(self, path):
+        """
+        Save the figure to path (format from the extension) and close it
+        """
+        import matplotlib.pyplot as plt
 
-        plt.legend(handles=[up, down])
\ No newline at end of file
+        self.fig.savefig(path)
+        plt.close(self.fig)
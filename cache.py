@@ -0,0 +1,130 @@
+"""
+Opt-in cache of lattices (stock trees, calibrated rate trees).
+"""
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from lattice import TriangularLattice
+
+
+class LatticeCache:
+    """
+    LRU cache of lattices keyed by a hash of their inputs
+
+    --------------------------------
+    Note:
+        cache = LatticeCache(max_bytes=512 * 2**20)
+        BinomialTree(param, n, cache=cache)
+        HoLee(zcb, T, sigma, cache=cache)
+
+        The same model inputs then give back the same lattice object:
+        one lookup instead of a tree build. Cached arrays are read-only
+        (shared between all users of the cache).
+
+        Least recently used entries are evicted once the cached arrays
+        take more than max_bytes. Counters: hits, misses, evictions.
+    """
+
+    def __init__(self, max_bytes=256 * 2**20):
+        self.max_bytes = max_bytes  # bound on cached array bytes
+        self.nbytes = 0             # current cached array bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._store = OrderedDict()  # key: (value, nbytes)
+
+    @staticmethod
+    def key(*inputs):
+        """
+        Hashable key from model inputs (scalars, strings, arrays)
+        """
+        key = []
+        for x in inputs:
+            if isinstance(x, (np.ndarray, list, tuple)):
+                x = np.ascontiguousarray(x, dtype=float)
+                x = (x.shape, hashlib.blake2b(x.tobytes(), digest_size=16).hexdigest())
+            elif isinstance(x, (float, np.floating)):
+                x = float(x)
+            key.append(x)
+        return tuple(key)
+
+    def get(self, key, build):
+        """
+        Cached value of key, calling build() on a miss
+        ==============================
+        Args:
+            key (tuple): see LatticeCache.key
+            build (callable): build() -> value (array / lattice / tuple)
+
+        Returns:
+            cached value (read-only arrays); a value larger than
+            max_bytes is returned as built (writable, not cached)
+        """
+        if key in self._store:
+            self.hits += 1
+            self._store.move_to_end(key)
+            return self._store[key][0]
+
+        self.misses += 1
+        value = build()
+        nbytes = _nbytes(value)
+
+        if nbytes <= self.max_bytes:
+            _freeze(value) # shared from now on
+            self._store[key] = (value, nbytes)
+            self.nbytes += nbytes
+
+            while self.nbytes > self.max_bytes:
+                _, (_, size) = self._store.popitem(last=False)
+                self.nbytes -= size
+                self.evictions += 1
+
+        return value
+
+    def clear(self):
+        self._store.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        """
+        Counters as a dict
+        """
+        return {"entries": len(self._store), "nbytes": self.nbytes,
+                "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions}
+
+    def __len__(self):
+        return len(self._store)
+
+    def __contains__(self, key):
+        return key in self._store
+
+
+def _arrays(value):
+    """
+    Arrays of value (array / lattice / tuple / list of them)
+    """
+    if isinstance(value, TriangularLattice):
+        value = value.data
+    if isinstance(value, np.ndarray):
+        return [value]
+    if isinstance(value, (tuple, list)):
+        return [a for x in value for a in _arrays(x)]
+    return []
+
+
+def _nbytes(value):
+    return sum(a.nbytes for a in _arrays(value))
+
+
+def _freeze(value):
+    """
+    Make arrays of value read-only
+    """
+    for a in _arrays(value):
+        a.setflags(write=False)
@@ -1,5 +1,9 @@
 import numpy as np
 
+from option_param import Parameters
+from lattice import TriangularLattice
+import instrument
+
 class BinomialTree:
     """
     Class Binomial tree.
@@ -20,11 +24,29 @@ class BinomialTree:
     book's Stochastic Calculos for Finance I:
     use obj.set_apm(u, d),
     where u and d have to be manually inputed.
+
+    Price only:
+        obj = BinomialTree(param, n, price_only=True)
+        keeps a single rolling column of option values (O(n) memory)
+        instead of the (n+1)x(n+1) trees. Prices are stored in
+        obj.eu_c, obj.eu_p, obj.am_c and obj.am_p.
+        The full trees (e.g. for GraphTree) are only built on request:
+        obj.price_only = False, then obj.set_european() / obj.set_american()
+
+    Trees (t_stock, t_eu_c, ...) are TriangularLattice objects:
+    np.asarray(obj.t_stock) gives the dense (n+1)x(n+1) array.
+
+    Cache:
+        obj = BinomialTree(param, n, cache=LatticeCache())
+        t_stock is shared (read-only) between trees with the same
+        stock, u, d and n, e.g. every strike on the same underlying.
     """
 
-    def __init__(self, param, n):
+    def __init__(self, param, n, price_only=False, cache=None):
         self.param = param      # Parameter object
         self.n = n              # number of timestep
+        self.price_only = price_only  # rolling column, no full tree
+        self.cache = cache      # optional cache.LatticeCache for t_stock
 
         self.dt = self.param.tau / self.n
 
@@ -32,8 +54,10 @@ class BinomialTree:
         self.d = 0 # down movement
 
         self.p = 0 # probability
+        self.model = None # last set_*: ("crr",), ("lr",) or ("apm", u, d)
 
-        self.t_stock = np.zeros((n+1,n+1))
+        # Full stock tree only allocated when needed
+        self.t_stock = 0 if price_only or cache is not None else TriangularLattice(n+1)
 
         # set European and Amerian option
         self.t_eu_c = 0
@@ -41,6 +65,14 @@ class BinomialTree:
         self.t_am_c = 0
         self.t_am_p = 0
 
+        # Option prices at time 0
+        self.eu_c = np.nan
+        self.eu_p = np.nan
+        self.am_c = np.nan
+        self.am_p = np.nan
+
+        # First 3 columns of each option tree (price only, for Greeks)
+        self._head = {}
 
         self.set_crr() # By default using the CRR model
 
@@ -53,6 +85,33 @@ class BinomialTree:
         self.d = 1/self.u # down (faster)
 
         self.p = (np.exp(self.param.rate * self.dt) - self.d) / (self.u - self.d)
+        self.model = ("crr",)
+
+    def set_lr(self):
+        """
+        Set parameter according to the Leisen and Reimer (1996) model
+        (Peizer-Pratt method 2 inversion). Tree centred on the strike:
+        converges in O(1/n^2) without the CRR oscillations.
+        n has to be odd.
+        """
+        if self.n % 2 == 0:
+            raise ValueError("Leisen-Reimer tree needs an odd n, got {}".format(self.n))
+
+        vol_t = self.param.vol * np.sqrt(self.param.tau)
+        d1 = (np.log(self.param.stock / self.param.strike) \
+            + (self.param.rate + 0.5 * self.param.vol**2) * self.param.tau) / vol_t
+        d2 = d1 - vol_t
+
+        def h(z):
+            # Peizer-Pratt inversion of the normal cdf
+            x = z / (self.n + 1/3 + 0.1 / (self.n + 1))
+            return 0.5 + np.sign(z) * 0.5 * np.sqrt(1 - np.exp(-x**2 * (self.n + 1/6)))
+
+        growth = np.exp(self.param.rate * self.dt)
+        self.p = h(d2)
+        self.u = growth * h(d1) / self.p
+        self.d = (growth - self.p * self.u) / (1 - self.p)
+        self.model = ("lr",)
 
     def set_apm(self, u, d):
         """
@@ -63,7 +122,9 @@ class BinomialTree:
         self.u = u
         self.d = d
         self.p = (1 + self.param.rate - self.d) / (self.u - self.d)
+        self.model = ("apm", u, d)
 
+    @instrument.timed
     def set_tree(self):
         """
         Summary:
@@ -73,23 +134,64 @@ class BinomialTree:
               you can vectorise one of the loop
             - For european option pricing,
               only Terminal Stock price required.
+            - With a cache, the tree is looked up first.
         """
-        for i in range(self.n+1):
-            self.t_stock[:i+1,i:i+1] = (self.param.stock * self.u**(np.arange(i,-1,-1)) \
-                * self.d**(np.arange(0,i+1,1))).reshape(-1,1)
+        if self.cache is not None:
+            key = self.cache.key("stock", self.param.stock, self.u, self.d, self.n)
+            self.t_stock = self.cache.get(key, self._build_tree)
+            return
+
+        self.t_stock = self._build_tree()
 
         return
 
+    def _build_tree(self):
+        """
+        New stock tree
+        """
+        tree = TriangularLattice(self.n+1)
+        for i in range(self.n+1):
+            tree[:i+1, i] = self.stock_column(i)
+
+        instrument.alloc("BinomialTree.t_stock", tree.nbytes)
+        return tree
 
-    def set_european(self):
+    def stock_column(self, i):
+        """
+        Stock price at time step i (row j <=> j down movements)
+        """
+        return self.param.stock * self.u**(np.arange(i, -1, -1)) \
+            * self.d**(np.arange(0, i+1, 1))
+
+    @instrument.timed
+    def set_european(self, method="backward"):
         """
         Set European Call and Put option
+
+        method:
+            "backward": backward induction through the tree
+            "terminal": discounted binomial-weighted sum over the terminal
+                        nodes only (no backward loop, no tree). Prices are
+                        stored in eu_c and eu_p.
         """
-        self.t_stock[:,-1] = (self.param.stock * self.u**(np.arange(self.n, -1, -1)) \
-                * self.d**(np.arange(0,self.n + 1, 1)))
+        if method == "terminal":
+            return self._terminal_european()
+
+        if self.price_only:
+            return self._rolling_european()
+
+        if self.cache is not None: # cached tree is read-only
+            self.set_tree()
+        else:
+            if not isinstance(self.t_stock, TriangularLattice):
+                self.t_stock = TriangularLattice(self.n+1)
+
+            self.t_stock[:,-1] = (self.param.stock * self.u**(np.arange(self.n, -1, -1)) \
+                    * self.d**(np.arange(0,self.n + 1, 1)))
 
         self.t_eu_c = self.t_stock.copy()
         self.t_eu_p = self.t_stock.copy()
+        instrument.alloc("BinomialTree.t_eu", 2 * self.t_stock.nbytes)
 
         #Intrinsic option price at the final node
         self.t_eu_c[:,-1] =  np.maximum(self.t_eu_c[:,-1] \
@@ -110,15 +212,22 @@ class BinomialTree:
                 * (self.p * self.t_eu_p[:i, i] \
                 + (1 - self.p) * self.t_eu_p[1:i+1, i])
 
+        self.eu_c = self.t_eu_c[0, 0]
+        self.eu_p = self.t_eu_p[0, 0]
 
+    @instrument.timed
     def set_american(self):
         """
         Set American call and put option
         """
+        if self.price_only:
+            return self._rolling_american()
+
         self.set_tree()
 
         self.t_am_c = self.t_stock.copy()
         self.t_am_p = self.t_stock.copy()
+        instrument.alloc("BinomialTree.t_am", 2 * self.t_stock.nbytes)
 
         self.t_am_c[:,-1] = np.maximum(self.t_stock[:,-1] \
             - self.param.strike,0.0)
@@ -126,20 +235,552 @@ class BinomialTree:
         self.t_am_p[:,-1] = np.maximum(self.param.strike \
             - self.t_stock[:,-1], 0.0)
 
+        disc = np.exp(-self.param.rate * self.dt)
+        prune = self._prune()
+        early_call = not (prune and self.param.dividend == 0)
+        b = np.count_nonzero(self.t_stock[:,-1] > self.param.strike)
+
         for i in range(self.n-1,-1,-1):
 
-            # Call
-            ex_c = self.t_stock[:,i] - self.param.strike
-            wait_c = np.exp(-self.param.rate * self.dt) \
-                * (self.p * self.t_am_c[:i+1, i+1] \
+            # Call (never exercised early without dividend)
+            wait_c = disc * (self.p * self.t_am_c[:i+1, i+1] \
                 + (1 - self.p) * self.t_am_c[1:i+2, i+1])
 
-            self.t_am_c[:i+1,i] = np.maximum(ex_c[:i+1], wait_c[:i+1])
+            if early_call:
+                ex_c = self.t_stock[:i+1, i] - self.param.strike
+                wait_c = np.maximum(ex_c, wait_c)
+
+            self.t_am_c[:i+1,i] = wait_c
 
             # Put
-            ex_p =  self.param.strike - self.t_stock[:,i]
-            wait_p = np.exp(-self.param.rate * self.dt) \
-                * (self.p * self.t_am_p[:i+1, i+1] \
-                + (1 - self.p) * self.t_am_p[1:i+2, i+1])
+            self.t_am_p[:i+1,i], b = self._put_step(self.t_stock[:i+1, i],
+                self.t_am_p[:i+2, i+1], b, disc, prune)
+
+        self.am_c = self.t_am_c[0, 0]
+        self.am_p = self.t_am_p[0, 0]
+
+    def _rolling_european(self):
+        """
+        European Call and Put using a single rolling column: O(n) memory.
+        Column i overwrites the first i+1 values of column i+1.
+        """
+        disc = np.exp(-self.param.rate * self.dt)
+
+        stock = self.stock_column(self.n)
+        call = np.maximum(stock - self.param.strike, 0.0)
+        put = np.maximum(self.param.strike - stock, 0.0)
+
+        if self.n <= 2:
+            self._keep(self.n, eu_c=call, eu_p=put)
+
+        for i in range(self.n, 0, -1):
+            call[:i] = disc * (self.p * call[:i] + (1 - self.p) * call[1:i+1])
+            put[:i] = disc * (self.p * put[:i] + (1 - self.p) * put[1:i+1])
+
+            if i <= 3:
+                self._keep(i-1, eu_c=call[:i], eu_p=put[:i])
+
+        self.eu_c = call[0]
+        self.eu_p = put[0]
+
+    def _terminal_european(self):
+        """
+        Closed form European Call and Put:
+            V = exp(-r T) * sum_j C(n, j) p^(n-j) (1-p)^j payoff(S_j)
+        Computed in log-space so that neither u**n nor p**j
+        overflow / underflow for large n.
+        """
+        if not 0 < self.p < 1:
+            raise ValueError("probability p = {} not in (0, 1)".format(self.p))
+
+        n = self.n
+        j = np.arange(n + 1) # number of down movements
+
+        # log C(n, j) = sum_{k=1}^{j} log(n-k+1) - log(k)
+        log_comb = np.zeros(n + 1)
+        log_comb[1:] = np.cumsum(np.log(n - j[1:] + 1) - np.log(j[1:]))
+
+        log_w = log_comb + (n - j) * np.log(self.p) + j * np.log1p(-self.p) \
+            - self.param.rate * self.dt * n # discounted weights
+        log_s = np.log(self.param.stock) + (n - j) * np.log(self.u) \
+            + j * np.log(self.d)
+
+        itm = log_s > np.log(self.param.strike)
+        # S * w and K * w never leave log-space before exp
+        call = np.exp(log_w[itm] + log_s[itm]).sum() \
+            - self.param.strike * np.exp(log_w[itm]).sum()
+        put = self.param.strike * np.exp(log_w[~itm]).sum() \
+            - np.exp(log_w[~itm] + log_s[~itm]).sum()
+
+        self.eu_c = call
+        self.eu_p = put
+
+    def _rolling_american(self):
+        """
+        American Call and Put using a single rolling column: O(n) memory.
+        Stock prices of column i are rebuilt from column i+1 (S / u):
+        all rows if the call can be exercised early, otherwise only the
+        rows the put needs.
+
+        Put: only rows above the early exercise boundary b go through
+        the backward step (see _put_step). Rows below are never stored,
+        apart from row b, set to K - S for the next step.
+        """
+        disc = np.exp(-self.param.rate * self.dt)
+        pu, pd = disc * self.p, disc * (1 - self.p) # discounted probabilities
+        K = self.param.strike
+
+        stock = self.stock_column(self.n)
+        call = np.maximum(stock - K, 0.0)
+        put = np.maximum(K - stock, 0.0)
+
+        prune = self._prune()
+        early_call = not (prune and self.param.dividend == 0)
+        b = np.count_nonzero(stock > K)
+
+        if self.n <= 2:
+            self._keep(self.n, am_c=call, am_p=put)
+
+        for i in range(self.n-1, -1, -1):
+            m = min(b, i+1) if prune else i+1 # rows in continuation region
+            r = min(m+1, i+1) # stock rows needed for the put
+
+            # Call (in place: the down child is read first)
+            down = pd * call[1:i+2]
+            call[:i+1] *= pu
+            call[:i+1] += down
+            if early_call:
+                stock = stock[:i+1] / self.u
+                np.maximum(call[:i+1], stock - K, out=call[:i+1])
+            else:
+                stock = stock[:r] / self.u # r never grows from one column to the next
+
+            value = K - stock[:m]
+            wait = pu * put[:m] + pd * put[1:m+1]
+            put[:m] = np.maximum(value, wait)
+
+            b = self._exercise_row(value, wait) if prune else m
+            if b <= i:
+                put[b] = K - stock[b]
+
+            if i <= 2:
+                full = put[:i+1].copy()
+                full[b:] = K - self.stock_column(i)[b:]
+                self._keep(i, am_c=call[:i+1], am_p=full)
+
+        self.am_c = call[0]
+        self.am_p = put[0]
+
+    def _prune(self):
+        """
+        True if the tree is risk neutral (p u + (1-p) d = exp(r dt))
+        and r >= 0. Then:
+            - a put node whose two children are exercised is exercised
+              (K - S >= exp(-r dt) K - S)
+            - without dividend, a call is never exercised early
+        """
+        g = np.exp(-self.param.rate * self.dt) \
+            * (self.p * self.u + (1 - self.p) * self.d)
+        return self.param.rate >= 0 and g >= 1 - 1e-12
+
+    def _put_step(self, stock, put, b, disc, prune):
+        """
+        American put of column i from column i+1
+        ==============================
+        Args:
+            stock (array): stock price of column i (i+1 rows)
+            put (array): put value of column i+1 (only i+2 rows read)
+            b (int): first row of the exercise region of column i+1
+            disc (float): one step discount factor
+            prune (bool): see _prune
+
+        Returns:
+            (array, int): put value of column i,
+                first row of the exercise region of column i
+
+        =========================
+        With prune, rows >= b of column i are exercised (both children
+        exercised) and set to K - S directly: only the continuation
+        region goes through the backward step.
+        """
+        i = len(stock) - 1
+        m = min(b, i+1) if prune else i+1
+
+        value = self.param.strike - stock
+        wait = disc * (self.p * put[:m] + (1 - self.p) * put[1:m+1])
+
+        b = self._exercise_row(value[:m], wait) if prune else m
+        value[:m] = np.maximum(value[:m], wait)
+
+        return value, b
+
+    @staticmethod
+    def _exercise_row(value, wait):
+        """
+        First row of the exercise region: the bottom rows where the
+        exercise value is >= the continuation value (one per row computed)
+
+        Scanned upwards from the last row: with pruning the boundary moves
+        by a row or two per step, cheaper than a vectorised search.
+        """
+        b = len(wait)
+        while b > 0 and value[b-1] >= wait[b-1]:
+            b -= 1
+        return b
+
+    def _keep(self, i, **columns):
+        """
+        Store a copy of column i (i <= 2) of the rolling option values
+        """
+        for name, column in columns.items():
+            self._head.setdefault(name, [None] * 3)[i] = column.copy()
+
+    def _first_columns(self, name):
+        """
+        First 3 columns of option tree name ("eu_c", "am_p", ...),
+        pricing the option by backward induction first if these
+        columns do not exist yet.
+        """
+        if self.n < 2:
+            raise ValueError("Greeks need at least n = 2 timesteps")
+
+        # priced without the tree (not yet priced, method="terminal"):
+        # backward pricing first
+        if self.price_only:
+            priced = name in self._head
+        else:
+            priced = isinstance(getattr(self, "t_" + name), TriangularLattice)
+
+        if not priced:
+            if name.startswith("eu"):
+                self.set_european()
+            else:
+                self.set_american()
+
+        if self.price_only:
+            return self._head[name]
+
+        tree = getattr(self, "t_" + name)
+        return [tree[:i+1, i] for i in range(3)]
+
+    @instrument.timed
+    def greeks(self, style="american", batched=True, dvol=0.01, drate=0.0001):
+        """
+        Greeks of the Call and Put
+        ==============================
+        Args:
+            style (str): "american" or "european"
+            batched (bool): reprice the vega / rho bumps in a single
+                BinomialChain pass (CRR trees only, otherwise one price
+                only tree per bump)
+            dvol (float): volatility bump
+            drate (float): rate bump
+
+        Returns:
+            dict: {"call": {...}, "put": {...}} with keys
+                price, delta, gamma, theta, vega, rho
+
+        =========================
+        delta, gamma and theta are read off the first 3 columns
+        of the tree already priced (no extra tree).
+        vega and rho use central bump-and-reprice, the bumped trees
+        set with the same model as this one (set_crr, set_lr, set_apm).
+        theta: value at S two steps ahead, quadratic interpolation of
+        the 3 nodes of column 2 (the middle node S u d is S only if u d = 1).
+        u / d assigned by hand are not known here: ValueError.
+        """
+        names = {"european": ("eu_c", "eu_p"),
+                 "american": ("am_c", "am_p")}[style]
+
+        S = self.param.stock
+        s1 = S * np.array([self.u, self.d])
+        s2 = S * np.array([self.u**2, self.u * self.d, self.d**2])
+
+        # Bumps: vol up, vol down, rate up, rate down
+        vol = self.param.vol + np.array([dvol, -dvol, 0.0, 0.0])
+        rate = self.param.rate + np.array([0.0, 0.0, drate, -drate])
+
+        ref = self._set(BinomialTree(self.param, self.n, price_only=True))
+        if not np.allclose([self.u, self.d, self.p], [ref.u, ref.d, ref.p]):
+            raise ValueError("greeks need u, d, p set by set_crr, set_lr or set_apm")
+
+        if batched and self.model == ("crr",):
+            chain = BinomialChain(S, self.param.strike, self.param.t,
+                                  self.param.T, rate, self.param.dividend,
+                                  vol, self.n)
+            if style == "european":
+                chain.set_european()
+            else:
+                chain.set_american()
+            bumped = (getattr(chain, names[0]), getattr(chain, names[1]))
+        else:
+            bumped = ([], [])
+            for v, r in zip(vol, rate):
+                tree = BinomialTree(Parameters(S, self.param.strike,
+                                               self.param.t, self.param.T, r,
+                                               self.param.dividend, v),
+                                    self.n, price_only=True)
+                self._set(tree)
+                if style == "european":
+                    tree.set_european()
+                else:
+                    tree.set_american()
+                bumped[0].append(getattr(tree, names[0]))
+                bumped[1].append(getattr(tree, names[1]))
+
+        result = {}
+        for key, name, v in zip(("call", "put"), names, bumped):
+            v0, v1, v2 = self._first_columns(name)
+
+            delta_up = (v2[0] - v2[1]) / (s2[0] - s2[1])
+            delta_down = (v2[1] - v2[2]) / (s2[1] - s2[2])
+
+            # value at (S, 2 dt): Lagrange interpolation on the column 2 nodes
+            at_spot = sum(v2[j] * np.prod([(S - s2[k]) / (s2[j] - s2[k])
+                                           for k in range(3) if k != j])
+                          for j in range(3))
+
+            result[key] = {
+                "price": v0[0],
+                "delta": (v1[0] - v1[1]) / (s1[0] - s1[1]),
+                "gamma": (delta_up - delta_down) / (0.5 * (s2[0] - s2[2])),
+                "theta": (at_spot - v0[0]) / (2 * self.dt),
+                "vega": (v[0] - v[1]) / (2 * dvol),
+                "rho": (v[2] - v[3]) / (2 * drate),
+            }
+
+        return result
+
+    def _set(self, tree):
+        """
+        Set tree with the model of this one (set_crr, set_lr or set_apm)
+        """
+        name, *args = self.model
+        getattr(tree, "set_" + name)(*args)
+        return tree
+
+
+def price(param, n=25, style="european", model="crr", richardson=False,
+          tolerance=None, n_max=100001):
+    """
+    Call and Put price with convergence acceleration
+    ==============================
+    Args:
+        param (Parameters): option parameters
+        n (int): number of timestep (first guess if tolerance is given)
+        style (str): "european" or "american"
+        model (str): "crr" (set_crr) or "lr" (set_lr, n made odd)
+        richardson (bool): two-point Richardson extrapolation on n and
+            2n+1 (LR only)
+        tolerance (float): if given, n is doubled until call and put
+            move by less than tolerance (no tree above n_max timestep)
+
+    Returns:
+        dict: {"call": float, "put": float, "n": int, "converged": bool}
+            converged is False if n_max was reached before tolerance
+            (always True without tolerance)
+
+    =========================
+    LR error is smooth, ~ c / n^2:
+        V = (m^2 V(m) - n^2 V(n)) / (m^2 - n^2), m = 2n + 1
+    The CRR error oscillates with n (strike position between nodes):
+    extrapolating it makes prices worse, ValueError.
+    Each step count is priced once (reused by the next tolerance step).
+    """
+    if richardson and model != "lr":
+        raise ValueError("richardson needs model='lr' (CRR error oscillates)")
+
+    prices = {}  # n: [call, put]
+
+    def run(n):
+        if n not in prices:
+            tree = BinomialTree(param, n, price_only=True)
+            if model == "lr":
+                tree.set_lr()
+            if style == "european":
+                tree.set_european()
+                prices[n] = np.array([tree.eu_c, tree.eu_p])
+            else:
+                tree.set_american()
+                prices[n] = np.array([tree.am_c, tree.am_p])
+        return prices[n]
+
+    def step(n):
+        # next (odd for LR) step count
+        return 2 * n + 1 if model == "lr" else 2 * n
+
+    def largest(n):
+        # largest tree priced by estimate(n)
+        return step(n) if richardson else n
+
+    def estimate(n):
+        if not richardson:
+            return run(n)
+        m = step(n)
+        return (m**2 * run(m) - n**2 * run(n)) / (m**2 - n**2)
+
+    if model == "lr" and n % 2 == 0:
+        n += 1
+
+    value = estimate(n)
+    converged = tolerance is None
+    while not converged and largest(step(n)) <= n_max:
+        n = step(n)
+        previous, value = value, estimate(n)
+        converged = np.max(np.abs(value - previous)) < tolerance
+
+    return {"call": value[0], "put": value[1], "n": n, "converged": bool(converged)}
+
+
+class BinomialChain:
+    """
+    Price a whole option chain (many strikes / expiries) at once.
+    By default use CRR methodology
+
+    --------------------------------
+    Note:
+        All inputs are broadcast against each other, e.g.
+        obj = BinomialChain(100, np.arange(80, 121), 0, 1, 0.05, 0.0, 0.2, n)
+        prices 41 strikes in one backward induction over a
+        (contracts x nodes) array. The number of timestep n is shared.
+
+        Contracts with the same underlying, u and d share the same
+        stock lattice (see obj.lattice_id).
+
+        Prices are stored in obj.eu_c, obj.eu_p, obj.am_c and obj.am_p
+        (one per contract, same order as the inputs).
+    """
+
+    def __init__(self, stock, strike, t, T, rate, dividend, vol, n):
+        (self.stock, self.strike, self.t, self.T,
+         self.rate, self.dividend, self.vol) = np.broadcast_arrays(
+            *[np.atleast_1d(np.asarray(x, dtype=float))
+              for x in (stock, strike, t, T, rate, dividend, vol)])
+
+        self.tau = self.T - self.t  # Time to Maturity
+        self.n = n                  # number of timestep (shared)
+        self.dt = self.tau / self.n
+
+        self.u = 0 # up movement
+        self.d = 0 # down movement
+        self.p = 0 # probability
+
+        # Option prices at time 0 (one per contract)
+        self.eu_c = np.full(self.stock.shape, np.nan)
+        self.eu_p = np.full(self.stock.shape, np.nan)
+        self.am_c = np.full(self.stock.shape, np.nan)
+        self.am_p = np.full(self.stock.shape, np.nan)
+
+        # Terminal stock price per lattice, if computed elsewhere
+        self.terminal = None
+
+        self.set_crr() # By default using the CRR model
+
+    @classmethod
+    def from_parameters(cls, params, n):
+        """
+        Build chain from a list of Parameters object
+        """
+        return cls(*[[getattr(i, k) for i in params]
+                     for k in ("stock", "strike", "t", "T",
+                               "rate", "dividend", "vol")], n)
+
+    @classmethod
+    def from_batch(cls, batch, n):
+        """
+        Build chain from a ParameterBatch (columns used without copy)
+        """
+        return cls(batch.stock, batch.strike, batch.t, batch.T,
+                   batch.rate, batch.dividend, batch.vol, n)
+
+    def set_crr(self):
+        """
+        Set parameter according to the Cox, Ross and Rubinstein (1979) model
+        """
+        self.u = np.exp(self.vol * np.sqrt(self.dt)) # up
+        self.d = 1/self.u # down (faster)
+
+        self.p = (np.exp(self.rate * self.dt) - self.d) / (self.u - self.d)
+
+        self._set_lattice()
+
+    def _set_lattice(self):
+        """
+        Group contracts sharing the same stock lattice (stock, u, d)
+        """
+        keys = np.column_stack((self.stock, self.u, self.d))
+        keys, self.lattice_id = np.unique(keys, axis=0, return_inverse=True)
+        self.lattice_id = self.lattice_id.ravel()
+        self._lattice = keys.T.reshape(3, -1, 1) # stock, u, d per lattice
+
+    def share_lattice(self, lattice, lattice_id, terminal):
+        """
+        Use stock lattices computed elsewhere (e.g. in shared memory)
+        ==============================
+        Args:
+            lattice (array): (3, lattices, 1) stock, u and d per lattice
+            lattice_id (array): lattice of each contract
+            terminal (array): (lattices, n+1) terminal stock prices
+        """
+        self._lattice = lattice
+        self.lattice_id = lattice_id
+        self.terminal = terminal
+
+    def stock_column(self, i):
+        """
+        Stock price at time step i, one row per distinct lattice
+        (use obj.lattice_id to map contracts to lattices)
+        """
+        if i == self.n and self.terminal is not None:
+            return self.terminal
+
+        stock, u, d = self._lattice
+        return stock * u**(np.arange(i, -1, -1)) * d**(np.arange(0, i+1, 1))
+
+    @instrument.timed
+    def set_european(self):
+        """
+        Set European Call and Put option for every contract
+        """
+        disc = np.exp(-self.rate * self.dt)[:, None]
+        p = self.p[:, None]
+        K = self.strike[:, None]
+
+        stock = self.stock_column(self.n)[self.lattice_id]
+        call = np.maximum(stock - K, 0.0)
+        put = np.maximum(K - stock, 0.0)
+
+        # Backward tree (contracts x nodes):
+        for i in range(self.n, 0, -1):
+            call[:, :i] = disc * (p * call[:, :i] + (1 - p) * call[:, 1:i+1])
+            put[:, :i] = disc * (p * put[:, :i] + (1 - p) * put[:, 1:i+1])
+
+        self.eu_c = call[:, 0]
+        self.eu_p = put[:, 0]
+
+    @instrument.timed
+    def set_american(self):
+        """
+        Set American Call and Put option for every contract
+        """
+        disc = np.exp(-self.rate * self.dt)[:, None]
+        p = self.p[:, None]
+        K = self.strike[:, None]
+        u = self._lattice[1]
+
+        stock = self.stock_column(self.n)
+        call = np.maximum(stock[self.lattice_id] - K, 0.0)
+        put = np.maximum(K - stock[self.lattice_id], 0.0)
+
+        for i in range(self.n-1, -1, -1):
+            stock = stock[:, :i+1] / u
+            node = stock[self.lattice_id]
+
+            wait_c = disc * (p * call[:, :i+1] + (1 - p) * call[:, 1:i+2])
+            call[:, :i+1] = np.maximum(node - K, wait_c)
+
+            wait_p = disc * (p * put[:, :i+1] + (1 - p) * put[:, 1:i+2])
+            put[:, :i+1] = np.maximum(K - node, wait_p)
 
-            self.t_am_p[:i+1,i] = np.maximum(ex_p[:i+1], wait_p[:i+1])
+        self.am_c = call[:, 0]
+        self.am_p = put[:, 0]
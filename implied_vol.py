@@ -0,0 +1,274 @@
+"""
+Implied volatility of whole option chains priced with crr.BinomialChain.
+"""
+
+import numpy as np
+
+from crr import BinomialChain
+
+
+def black_scholes(stock, strike, tau, rate, vol, call=True):
+    """
+    Black-Scholes price and vega (vectorised)
+    ==============================
+    Args:
+        stock, strike, tau, rate, vol (float / array)
+        call (bool / array): True for a call, False for a put
+
+    Returns:
+        (array, array): price, vega
+
+    =========================
+    Same dynamic as BinomialTree: stock drifts at the risk free rate
+    (dividend not used).
+    """
+    from scipy.special import ndtr  # scipy loaded on first use only
+
+    vol_t = vol * np.sqrt(tau)
+    d1 = (np.log(stock / strike) + (rate + 0.5 * vol**2) * tau) / vol_t
+    d2 = d1 - vol_t
+    k = strike * np.exp(-rate * tau)
+
+    price = np.where(call, stock * ndtr(d1) - k * ndtr(d2),
+                     k * ndtr(-d2) - stock * ndtr(-d1))
+    vega = stock * np.exp(-0.5 * d1**2) / np.sqrt(2 * np.pi) * np.sqrt(tau)
+
+    return price, vega
+
+
+def barone_adesi_whaley(stock, strike, tau, rate, vol, call=True):
+    """
+    Barone-Adesi and Whaley (1987) American price (vectorised)
+    ==============================
+    Args:
+        see black_scholes
+
+    Returns:
+        (array, array): price, Black-Scholes vega
+
+    =========================
+    Without dividend the American call is the European call, only
+    the put gets an early exercise premium. The critical stock price
+    S* is found with a few Newton steps.
+    """
+    from scipy.special import ndtr
+
+    stock, strike, tau, rate, vol, call = np.broadcast_arrays(
+        stock, strike, tau, rate, vol, call)
+    price, vega = black_scholes(stock, strike, tau, rate, vol, call)
+
+    vol_t = vol * np.sqrt(tau)
+    m = 2 * rate / vol**2
+    k = -np.expm1(-rate * tau)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        q1 = 0.5 * (-(m - 1) - np.sqrt((m - 1)**2 + 4 * m / k))
+
+        # Seed for S* (Barone-Adesi and Whaley, eq. 27)
+        q_inf = 0.5 * (-(m - 1) - np.sqrt((m - 1)**2 + 4 * m))
+        s_inf = strike / (1 - 1 / q_inf)
+        h = (rate * tau - 2 * vol_t) * strike / (strike - s_inf)
+        s_star = s_inf + (strike - s_inf) * np.exp(h)
+
+        for _ in range(20):
+            d1 = (np.log(s_star / strike) + (rate + 0.5 * vol**2) * tau) / vol_t
+            put = black_scholes(s_star, strike, tau, rate, vol, False)[0]
+            g = strike - s_star - put + (1 - ndtr(-d1)) * s_star / q1
+            dg = -ndtr(d1) + (ndtr(d1) + np.exp(-0.5 * d1**2) \
+                / np.sqrt(2 * np.pi) / vol_t) / q1
+            s_star = s_star - g / dg
+
+        d1 = (np.log(s_star / strike) + (rate + 0.5 * vol**2) * tau) / vol_t
+        a1 = -s_star / q1 * (1 - ndtr(-d1))
+        american = np.where(stock > s_star,
+                            price + a1 * (stock / s_star)**q1,
+                            strike - stock)
+
+    early = ~call & (rate > 0) & np.isfinite(american)
+    price = np.where(early, american, price)
+
+    return price, vega
+
+
+def _solve(func, target, x, lo, hi, tol, max_iter):
+    """
+    Vectorised bracketed Newton / secant root finding of func(x) = target
+    ==============================
+    Args:
+        func (callable): func(x, active) -> (value, slope) for the
+            active rows only, value increasing in x
+        target (array): target value
+        x, lo, hi (array): first guess and bracket
+        tol (float): tolerance on |func(x) - target|
+        max_iter (int): maximum number of func evaluations
+
+    Returns:
+        (array, int): root (nan if not converged), evaluations
+
+    =========================
+    Newton step with the slope given by func on the first iteration,
+    secant slope afterwards. Any step leaving the bracket falls back
+    to bisection. No root in the bracket gives nan.
+    """
+    lo0, hi0 = lo.copy(), hi.copy()
+    x = np.clip(x, lo, hi)
+    x_prev = np.full(x.shape, np.nan)
+    f_prev = np.full(x.shape, np.nan)
+    done = np.zeros(x.shape, dtype=bool)
+
+    for count in range(1, max_iter + 1):
+        active = np.flatnonzero(~done)
+        value, slope = func(x[active], active)
+        f = value - target[active]
+
+        converged = np.abs(f) < tol
+        done[active[converged]] = True
+
+        xa = x[active]
+        lo[active] = np.where(f < 0, xa, lo[active])
+        hi[active] = np.where(f > 0, xa, hi[active])
+
+        secant = (f - f_prev[active]) / (xa - x_prev[active])
+        slope = np.where(np.isfinite(secant) & (secant > 0), secant, slope)
+        x_prev[active], f_prev[active] = xa, f
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = xa - f / slope
+        inside = (step > lo[active]) & (step < hi[active])
+        x[active] = np.where(converged, xa,
+                             np.where(inside, step, 0.5 * (lo[active] + hi[active])))
+
+        # bracket collapsed: root only if strictly inside the bracket
+        collapsed = ~done & ((hi - lo) < tol * 1e-3)
+        x[collapsed & ((lo <= lo0) | (hi >= hi0))] = np.nan
+        done |= collapsed
+        if done.all():
+            return x, count
+
+    x[~done] = np.nan
+    return x, max_iter
+
+
+class ImpliedVol:
+    """
+    Implied volatility of whole chains (vectorised)
+
+    --------------------------------
+    Note:
+        obj = ImpliedVol(n=200, style="american")
+        vols = obj.solve(prices, "put", 100, strikes, 0, 1, 0.05)
+
+        All contracts are solved together: each iteration prices the
+        contracts not converged yet in one BinomialChain pass
+        (O(n) memory per contract).
+
+        First guess: Black-Scholes (European) or Barone-Adesi-Whaley
+        (American) implied vol. With warm_start=True, the vols of the
+        previous solve are used instead (streaming: one tick to the next).
+
+        An American put priced at intrinsic value (immediate exercise)
+        is flat in vol: any vol of the flat region is returned.
+
+        Prices outside the no-arbitrage bounds give nan (not solved).
+        The vol bracket starts above |r| sqrt(tau / n) for each
+        contract: below, the CRR probability leaves [0, 1].
+    """
+
+    def __init__(self, n=200, style="american", tol=1e-6, max_iter=50,
+                 vol_min=1e-4, vol_max=5.0):
+        self.n = n                  # number of timestep
+        self.style = style          # "american" or "european"
+        self.tol = tol              # tolerance on price
+        self.max_iter = max_iter    # maximum chain pricings
+        self.vol_min = vol_min      # bracket
+        self.vol_max = vol_max
+
+        self.vols = None            # last solution
+        self.evaluations = 0        # chain pricings of the last solve
+
+    def guess(self, price, call, stock, strike, tau, rate):
+        """
+        Closed form implied vol: Black-Scholes or Barone-Adesi-Whaley
+        """
+        model = black_scholes if self.style == "european" else barone_adesi_whaley
+        func = (lambda v, i: model(stock[i], strike[i], tau[i], rate[i], v, call[i]))
+
+        lo = np.full(price.shape, self.vol_min)
+        hi = np.full(price.shape, self.vol_max)
+        vols, _ = _solve(func, price, np.full(price.shape, 0.3), lo, hi,
+                         self.tol, self.max_iter)
+        return vols
+
+    def solve(self, price, otype, stock, strike, t, T, rate, dividend=0.0,
+              warm_start=False):
+        """
+        Implied volatility
+        ==============================
+        Args:
+            price (array): market prices
+            otype (str / array): "call" or "put"
+            stock, strike, t, T, rate, dividend (float / array):
+                see option_param.Parameters
+            warm_start (bool): start from the previous solve
+
+        Returns:
+            array: implied vols (nan if not found), at least 1-d
+        """
+        price, otype, stock, strike, t, T, rate, dividend = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(price, dtype=float)), otype, *[
+                np.asarray(x, dtype=float)
+                for x in (stock, strike, t, T, rate, dividend)])
+        call = otype == "call"
+        tau = T - t
+
+        vols = np.full(price.shape, np.nan)
+        if warm_start and self.vols is not None and self.vols.shape == price.shape:
+            previous = self.vols
+        else:
+            previous = None
+
+        # contracts priced inside the no-arbitrage bounds only
+        valid = np.flatnonzero(self._arbitrage_free(price, call, stock, strike,
+                                                    tau, rate))
+        (price, call, stock, strike, t, T, tau, rate, dividend) = [
+            x[valid] for x in (price, call, stock, strike, t, T, tau, rate, dividend)]
+
+        if previous is not None:
+            x = np.where(np.isfinite(previous[valid]), previous[valid], 0.3)
+        else:
+            x = self.guess(price, call, stock, strike, tau, rate)
+            x = np.where(np.isfinite(x), x, 0.3)
+
+        def func(vol, i):
+            chain = BinomialChain(stock[i], strike[i], t[i], T[i], rate[i],
+                                  dividend[i], vol, self.n)
+            if self.style == "european":
+                chain.set_european()
+                value = np.where(call[i], chain.eu_c, chain.eu_p)
+            else:
+                chain.set_american()
+                value = np.where(call[i], chain.am_c, chain.am_p)
+            vega = black_scholes(stock[i], strike[i], tau[i], rate[i], vol, call[i])[1]
+            return value, vega
+
+        # CRR p in [0, 1] needs vol sqrt(dt) > |r| dt (1% margin)
+        lo = np.maximum(self.vol_min, 1.01 * np.abs(rate) * np.sqrt(tau / self.n))
+        hi = np.full(price.shape, self.vol_max)
+        vols[valid], self.evaluations = _solve(func, price, x, lo, hi,
+                                               self.tol, self.max_iter)
+        self.vols = vols
+        return self.vols
+
+    def _arbitrage_free(self, price, call, stock, strike, tau, rate):
+        """
+        Prices inside the no-arbitrage bounds (no dividend, as the tree):
+            European call: max(S - K e^(-r tau), 0) <= C <= S
+            European put:  max(K e^(-r tau) - S, 0) <= P <= K e^(-r tau)
+        American: also above the exercise value, put below K.
+        """
+        strike_pv = strike * np.exp(-rate * tau)
+        lower = np.maximum(np.where(call, stock - strike_pv, strike_pv - stock), 0.0)
+        upper = np.where(call, stock, strike_pv)
+        if self.style != "european":
+            lower = np.maximum(lower, np.where(call, stock - strike, strike - stock))
+            upper = np.where(call, upper, np.maximum(upper, strike))
+        return (price >= lower) & (price <= upper)
@@ -0,0 +1,140 @@
+"""
+Opt-in instrumentation of the pricers and calibrators.
+"""
+
+import functools
+import time
+
+_recorder = None  # active Recorder (None ==> instrumentation disabled)
+
+
+class Recorder:
+    """
+    Collect phase timings, allocations and solver counters
+
+    --------------------------------
+    Note:
+        with instrument.record() as rec:
+            HoLee(zcb, T, sigma)
+            BinomialTree(param, n).set_american()
+        rec.report()
+
+        Disabled (default), every hook is a single test on a module
+        global: no timing, no allocation.
+
+        Phases are named "Class.method" and timed inclusively
+        (set_american includes its set_tree). Counters:
+            "<Class>.solves"       root searches (one per theta)
+            "<Class>.evaluations"  objective function evaluations
+            "<Class>.iterations"   Newton / forward steps
+        Allocations: number and bytes of the lattices built.
+
+        callback(event) is called on every event (e.g. to forward to a
+        metrics pipeline), event = {"kind": "phase" / "count" / "alloc",
+        "name": str, "value": seconds / count / bytes}.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+
+        self.phases = {}       # name: [calls, seconds]
+        self.counts = {}       # name: total
+        self.allocations = {}  # name: [count, bytes]
+
+    def _emit(self, kind, name, value):
+        if self.callback is not None:
+            self.callback({"kind": kind, "name": name, "value": value})
+
+    def phase(self, name, seconds):
+        stats = self.phases.setdefault(name, [0, 0.0])
+        stats[0] += 1
+        stats[1] += seconds
+        self._emit("phase", name, seconds)
+
+    def count(self, name, k=1):
+        self.counts[name] = self.counts.get(name, 0) + k
+        self._emit("count", name, k)
+
+    def alloc(self, name, nbytes):
+        stats = self.allocations.setdefault(name, [0, 0])
+        stats[0] += 1
+        stats[1] += nbytes
+        self._emit("alloc", name, nbytes)
+
+    def report(self):
+        """
+        Structured report (dict of dict, JSON serialisable)
+        """
+        return {"phases": {k: {"calls": c, "seconds": s}
+                           for k, (c, s) in self.phases.items()},
+                "counts": dict(self.counts),
+                "allocations": {k: {"count": c, "bytes": b}
+                                for k, (c, b) in self.allocations.items()}}
+
+    def __enter__(self):
+        global _recorder
+        self._previous = _recorder
+        _recorder = self
+        return self
+
+    def __exit__(self, *exc):
+        global _recorder
+        _recorder = self._previous
+
+
+def record(callback=None):
+    """
+    Enable instrumentation inside a with block (see Recorder)
+    """
+    return Recorder(callback)
+
+
+def enabled():
+    return _recorder is not None
+
+
+def timed(method):
+    """
+    Decorator: time a method as phase "Class.method"
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if _recorder is None:
+            return method(self, *args, **kwargs)
+
+        rec = _recorder
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            rec.phase(type(self).__name__ + "." + method.__name__,
+                      time.perf_counter() - start)
+
+    return wrapper
+
+
+def count(name, k=1):
+    if _recorder is not None:
+        _recorder.count(name, k)
+
+
+def alloc(name, nbytes):
+    if _recorder is not None:
+        _recorder.alloc(name, nbytes)
+
+
+def counted(name, func):
+    """
+    func counting its calls under name (func itself when disabled)
+    """
+    if _recorder is None:
+        return func
+
+    rec = _recorder
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        rec.count(name)
+        return func(*args, **kwargs)
+
+    return wrapper
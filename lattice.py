@@ -0,0 +1,173 @@
+"""
+Triangular storage for recombining trees (binomial stock / rate trees).
+"""
+
+import numpy as np
+from numpy.lib.mixins import NDArrayOperatorsMixin
+
+
+class TriangularLattice(NDArrayOperatorsMixin):
+    """
+    Recombining tree with n columns: column i holds rows 0..i
+    (row j <=> j down movements).
+
+    --------------------------------
+    Note:
+        Columns are packed one after the other in obj.data:
+        column i starts at i(i+1)/2, so n(n+1)/2 values are stored
+        instead of the n^2 of a dense array (lower triangle never stored).
+
+        Indexing follows the dense (row, column) convention:
+            obj[j, i]      node j of column i (copy: np.float64, or one
+                           value per batch)
+            obj[:i+1, i]   column i (view)
+            obj[:k, :k]    first k columns (view)
+        Element-wise numpy operations (np.exp(obj), obj - c, ...)
+        return a TriangularLattice (arrays broadcast against obj.data).
+
+        np.asarray(obj) / obj.to_dense() gives the dense nxn array
+        (zeros below the diagonal), e.g. for GraphTree or pandas.
+
+        Leading axes are allowed (e.g. one lattice per scenario):
+        obj.data has shape (..., n(n+1)/2) and columns (..., i+1).
+    """
+
+    def __init__(self, n, data=None, batch_shape=()):
+        self.n = n  # number of columns
+
+        if data is None:
+            data = np.zeros(tuple(batch_shape) + (self.size(n),))
+        self.data = data
+
+    @staticmethod
+    def size(n):
+        """
+        Number of nodes of a lattice with n columns
+        """
+        return n * (n + 1) // 2
+
+    @classmethod
+    def from_dense(cls, dense):
+        """
+        Build from a dense (..., n, n) array (upper triangle kept)
+        """
+        dense = np.asarray(dense, dtype=float)
+        n = dense.shape[-1]
+        lattice = cls(n, batch_shape=dense.shape[:-2])
+        for i in range(n):
+            lattice.column(i)[...] = dense[..., :i+1, i]
+
+        return lattice
+
+    @property
+    def shape(self):
+        return self.data.shape[:-1] + (self.n, self.n)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def column(self, i):
+        """
+        Column i (view, i+1 rows)
+        """
+        if i < 0:
+            i += self.n
+        if not 0 <= i < self.n:
+            raise IndexError("column {} out of range for {} columns".format(i, self.n))
+
+        start = self.size(i)
+        return self.data[..., start:start + i + 1]
+
+    def truncate(self, n):
+        """
+        First n columns (view)
+        """
+        return TriangularLattice(n, self.data[..., :self.size(n)])
+
+    def copy(self):
+        return TriangularLattice(self.n, self.data.copy())
+
+    def to_dense(self):
+        """
+        Dense (..., n, n) array, zeros below the diagonal
+        """
+        dense = np.zeros(self.shape)
+        for i in range(self.n):
+            dense[..., :i+1, i] = self.column(i)
+
+        return dense
+
+    def to_frame(self):
+        """
+        pandas DataFrame (single lattice only)
+        """
+        import pandas as pd
+
+        return pd.DataFrame(self.to_dense())
+
+    def _square(self, key):
+        """
+        Number of columns k if key is [:k, :k], else None
+        """
+        if isinstance(key, tuple) and len(key) == 2 and all(isinstance(k, slice) for k in key):
+            stops = set()
+            for k in key:
+                start, stop, step = k.indices(self.n)
+                if start != 0 or step != 1:
+                    return None
+                stops.add(stop)
+            if len(stops) == 1:
+                return stops.pop()
+        return None
+
+    def __getitem__(self, key):
+        k = self._square(key)
+        if k is not None:
+            return self.truncate(k)
+
+        rows, col = key
+        if not isinstance(col, (int, np.integer)):
+            raise IndexError("TriangularLattice: use obj[rows, column]")
+        if isinstance(rows, (int, np.integer)):
+            # single node: a copy (scalar, or one value per batch), not
+            # a view aliasing the tree
+            return self.column(col)[..., rows].copy()[()]
+        return self.column(col)[..., rows]
+
+    def __setitem__(self, key, value):
+        rows, col = key
+        self.column(col)[..., rows] = value
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        return iter(self.to_dense())
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self.to_dense()
+        return dense if dtype is None else dense.astype(dtype)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != "__call__" or "out" in kwargs:
+            return NotImplemented
+
+        n = None
+        args = []
+        for x in inputs:
+            if isinstance(x, TriangularLattice):
+                if n is not None and x.n != n:
+                    raise ValueError("lattices of different sizes")
+                n = x.n
+                args.append(x.data)
+            else:
+                args.append(x) # scalar, or broadcast against obj.data
+
+        result = ufunc(*args, **kwargs)
+        if isinstance(result, tuple):
+            return tuple(TriangularLattice(n, r) for r in result)
+        return TriangularLattice(n, result)
+
+    def __repr__(self):
+        return "TriangularLattice(\n{}\n)".format(self.to_dense())
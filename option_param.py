@@ -2,10 +2,15 @@
 Class object to store all Options parameters.
 """
 
+import numpy as np
+
+
 class Parameters:
     """
     Object containing all parameter for option pricing
     """
+    __slots__ = ("stock", "strike", "t", "T", "tau", "rate", "dividend", "vol")
+
     def __init__(self, stock, strike, t, T, rate, dividend, vol):
         """
         Parameters:
@@ -34,5 +39,106 @@ class Parameters:
         Prints all attribute of object
         """
 
-        for i in (vars(self)):
-            print("{0:10}: {1}".format(i, vars(self)[i]))
+        for i in self.__slots__:
+            print("{0:10}: {1}".format(i, getattr(self, i)))
+
+
+class ParameterBatch:
+    """
+    Parameters of many options: one contiguous float64 column per field
+
+    --------------------------------
+    Note:
+        Same fields as Parameters, e.g. batch.strike is an array.
+        batch[i] gives the Parameters of row i, batch["vol"] a column.
+
+        Built without copy from float64 columns:
+            ParameterBatch.from_frame(df)
+            ParameterBatch.from_array(np.load(path, mmap_mode="r"))
+            (array of shape (7, m), rows in FIELDS order)
+        Structured arrays (one field per parameter) are accepted too
+        (one copy per field, fields are not contiguous).
+
+        All rows are validated at once (ValueError).
+    """
+    FIELDS = ("stock", "strike", "t", "T", "rate", "dividend", "vol")
+
+    def __init__(self, stock, strike, t, T, rate, dividend, vol, validate=True):
+        columns = np.broadcast_arrays(*[np.asarray(x, dtype=np.float64)
+            for x in (stock, strike, t, T, rate, dividend, vol)])
+
+        # no copy if already a contiguous float64 column
+        (self.stock, self.strike, self.t, self.T,
+         self.rate, self.dividend, self.vol) = [
+            np.ascontiguousarray(x).reshape(-1) for x in columns]
+
+        self.tau = self.T - self.t  # Time to Maturity
+
+        if validate:
+            self.validate()
+
+    @classmethod
+    def from_frame(cls, df, validate=True):
+        """
+        From a DataFrame with columns FIELDS
+        """
+        return cls(*[df[k].to_numpy(dtype=np.float64, copy=False)
+                     for k in cls.FIELDS], validate=validate)
+
+    @classmethod
+    def from_array(cls, array, validate=True):
+        """
+        From a (7, m) float64 array (e.g. memory-mapped) or
+        a structured array with fields FIELDS
+        """
+        if array.dtype.names is not None:
+            return cls(*[array[k] for k in cls.FIELDS], validate=validate)
+        return cls(*array, validate=validate)
+
+    @classmethod
+    def from_parameters(cls, params, validate=True):
+        """
+        From a list of Parameters object
+        """
+        return cls(*[[getattr(i, k) for i in params] for k in cls.FIELDS],
+                   validate=validate)
+
+    def validate(self):
+        """
+        Check all rows at once: finite values, stock, strike,
+        volatility and time to maturity > 0
+        """
+        bad = np.zeros(len(self), dtype=bool)
+        for k in self.FIELDS:
+            bad |= ~np.isfinite(getattr(self, k))
+        for x in (self.stock, self.strike, self.vol, self.tau):
+            bad |= ~(x > 0)
+
+        if bad.any():
+            rows = np.flatnonzero(bad)
+            raise ValueError("{} invalid row(s), first: {}".format(len(rows), rows[:10]))
+
+    def to_array(self):
+        """
+        (7, m) array, rows in FIELDS order
+        """
+        return np.vstack([getattr(self, k) for k in self.FIELDS])
+
+    def to_frame(self):
+        """
+        pandas DataFrame, one column per field
+        """
+        import pandas as pd
+
+        return pd.DataFrame({k: getattr(self, k) for k in self.FIELDS})
+
+    def __len__(self):
+        return len(self.stock)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        if isinstance(key, (int, np.integer)):
+            return Parameters(*[getattr(self, k)[key] for k in self.FIELDS])
+        return ParameterBatch(*[getattr(self, k)[key] for k in self.FIELDS],
+                              validate=False)
@@ -0,0 +1,133 @@
+"""
+Portfolio pricing over a process pool, stock lattices in shared memory.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from crr import BinomialChain
+
+FIELDS = ("stock", "strike", "t", "T", "rate", "dividend", "vol")
+
+_worker = {}  # shared arrays attached by each worker process
+
+
+def _columns(rows):
+    """
+    (7, m) float64 array of option parameters from a ParameterBatch,
+    DataFrame, structured array or dict of arrays
+    """
+    return np.vstack([np.asarray(rows[k], dtype=float) for k in FIELDS])
+
+
+def _share(array):
+    """
+    Copy array in a new shared memory block
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm
+
+
+def _attach(blocks, n, style):
+    """
+    Worker initializer: map the shared arrays (no copy, no pickle)
+    """
+    for name, (shm_name, shape, dtype) in blocks.items():
+        # child processes share the parent's resource tracker:
+        # blocks are unlinked once, by the parent
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _worker[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        _worker[name + "_shm"] = shm
+
+    _worker["n"] = n
+    _worker["style"] = style
+
+
+def _price_chunk(bounds):
+    """
+    Price rows start:stop of the shared table
+    """
+    start, stop = bounds
+    n = _worker["n"]
+
+    chain = BinomialChain(*_worker["inputs"][:, start:stop], n)
+
+    # only the lattices used by the chunk
+    used, local = np.unique(_worker["lattice_id"][start:stop], return_inverse=True)
+    chain.share_lattice(_worker["lattice"][:, used], local.ravel(),
+                        _worker["terminal"][used])
+
+    if _worker["style"] == "european":
+        chain.set_european()
+        return chain.eu_c, chain.eu_p
+
+    chain.set_american()
+    return chain.am_c, chain.am_p
+
+
+def iter_portfolio(rows, n, style="american", workers=None, chunk_size=4096):
+    """
+    Price a portfolio chunk by chunk, in input order
+    ==============================
+    Args:
+        rows: ParameterBatch, DataFrame, structured array or dict of
+            arrays with fields stock, strike, t, T, rate, dividend, vol
+        n (int): number of timestep
+        style (str): "american" or "european"
+        workers (int): number of processes (default: all cores)
+        chunk_size (int): rows per task
+
+    Yields:
+        (int, array, array): first row of the chunk, call and put prices
+
+    =========================
+    u, d and the stock lattices (grouped as in BinomialChain) are
+    computed once in the parent. Parameters, lattice ids and terminal
+    stock prices are put in multiprocessing.shared_memory: tasks only
+    carry (start, stop), workers map the arrays without copy.
+    """
+    inputs = _columns(rows)
+    chain = BinomialChain(*inputs, n)
+
+    arrays = {"inputs": inputs,
+              "lattice_id": chain.lattice_id,
+              "lattice": chain._lattice,
+              "terminal": chain.stock_column(n)}
+
+    bounds = [(i, min(i + chunk_size, inputs.shape[1]))
+              for i in range(0, inputs.shape[1], chunk_size)]
+
+    shms = {}
+    try:
+        for name, array in arrays.items():
+            shms[name] = _share(np.ascontiguousarray(array))
+        blocks = {name: (shms[name].name, arrays[name].shape, arrays[name].dtype)
+                  for name in arrays}
+
+        with ProcessPoolExecutor(workers, initializer=_attach,
+                                 initargs=(blocks, n, style)) as pool:
+            for (start, _), (call, put) in zip(bounds, pool.map(_price_chunk, bounds)):
+                yield start, call, put
+    finally:
+        for shm in shms.values():
+            shm.close()
+            shm.unlink()
+
+
+def price_portfolio(rows, n, style="american", workers=None, chunk_size=4096):
+    """
+    Price a portfolio over a process pool (see iter_portfolio)
+
+    Returns:
+        dict: {"call": array, "put": array}, same order as rows
+    """
+    call, put = [], []
+    for _, c, p in iter_portfolio(rows, n, style, workers, chunk_size):
+        call.append(c)
+        put.append(p)
+
+    return {"call": np.concatenate(call) if call else np.zeros(0),
+            "put": np.concatenate(put) if put else np.zeros(0)}
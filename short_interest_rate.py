@@ -1,12 +1,278 @@
-import pandas as pd
 import numpy as np
 
+# scipy (fsolve) only imported by the fsolve calibration / fit_swap_rate:
+# pricing with method="forward" (the default) loads numpy only
+
+from lattice import TriangularLattice
+import instrument
+
+
+def arrow_debreu(q, rates, dt, p=0.5):
+    """
+    Arrow-Debreu state prices one period forward
+    ==============================
+    Args:
+        q (array): state prices of column i (..., i+1 rows)
+        rates (array): short rates of column i (..., i+1 rows)
+        dt (float): time step
+        p (float): up move probability of column i (see up_probability)
+
+    Returns:
+        array: state prices of column i+1 (..., i+2 rows)
+    """
+    disc = q * np.exp(-rates * dt)
+
+    q_next = np.zeros(disc.shape[:-1] + (disc.shape[-1] + 1,))
+    q_next[..., :-1] += p * disc        # up move: same row
+    q_next[..., 1:] += (1 - p) * disc   # down move: next row
+
+    return q_next
+
+
+def state_prices(rates, dt, n, probs=0.5):
+    """
+    Arrow-Debreu state prices of columns 0 to n of a short rate tree
+    ==============================
+    Args:
+        rates (TriangularLattice): rates from Ho Lee or Black Derman Toy
+        dt (float / array): time step (or one per column)
+        n (int): last column
+        probs (float / array): up move probability (or one per column)
+
+    Returns:
+        list: state prices, one array per column
+    """
+    # one value per column
+    dt, probs = [np.full(n, x) if np.ndim(x) == 0 else x for x in (dt, probs)]
+
+    q = [np.ones(1)]
+    for i in range(n):
+        q.append(arrow_debreu(q[-1], rates[:i+1, i], dt[i], probs[i]))
+
+    return q
+
+
+def up_probability(dts):
+    """
+    Up move probability of each column of a short rate tree
+    ==============================
+    Args:
+        dts (array): time step of each column
+
+    Returns:
+        array: probabilities (0.5 for the longest step)
+
+    =========================
+    Nodes are 2 sigma sqrt(dt_max) apart in every column (dt_max:
+    longest step of the columns that branch, i.e. all but the last),
+    so that the tree recombines whatever the steps. Column i moves up
+    with probability p_i and down with 1 - p_i, the variance of the move
+        4 sigma^2 dt_max p_i (1 - p_i) = sigma^2 dt_i
+    gives p_i (the mean move goes into theta). On a uniform grid
+    p_i = 0.5, the usual Ho-Lee / BDT tree. The last column never
+    branches: 0.5 if its step is longer than dt_max.
+    Steps much shorter than dt_max give lopsided moves
+    (p_i ~ dt_i / (4 dt_max)): mean and variance stay exact, the
+    distribution converges more slowly.
+    """
+    dts = np.asarray(dts, dtype=float)
+    ratio = np.minimum(dts / longest_step(dts), 1.0)
+    # steps equal to rounding (e.g. np.diff of a uniform grid): p = 0.5,
+    # d p / d dt is infinite at dt = dt_max
+    ratio[np.isclose(ratio, 1.0, rtol=0, atol=1e-9)] = 1.0
+    return 0.5 * (1 - np.sqrt(1 - ratio))
+
+
+def longest_step(dts):
+    """
+    dt_max of up_probability: node spacing 2 sigma sqrt(dt_max)
+    """
+    dts = np.asarray(dts, dtype=float)
+    return dts[:-1].max() if len(dts) > 1 else dts[0]
+
+
+def time_grid(times, zcb, dates):
+    """
+    Add cash-flow dates falling between pillars to a ZCB curve
+    ==============================
+    Args:
+        times (array): pillar maturities (years, increasing)
+        zcb (array): ZCB prices at the pillars
+        dates (array): coupon / reset dates (years)
+
+    Returns:
+        (array, array): merged maturities, ZCB prices
+
+    =========================
+    Only dates that are not already pillars are added, their ZCB
+    price interpolated log-linearly (constant forward rate between
+    pillars, discount factor 1 at time 0). No extrapolation past
+    the last pillar (ValueError).
+    Use with HoLee(zcb, None, sigma, times=times) / BlackDermanToy:
+    one tree column per pillar or cash-flow date, steps may differ.
+    """
+    times = np.asarray(times, dtype=float)
+    zcb = np.asarray(zcb, dtype=float)
+    dates = np.asarray(dates, dtype=float)
+
+    if np.any(dates > times[-1]) or np.any(dates <= 0):
+        raise ValueError("dates must be in (0, {}]".format(times[-1]))
+
+    new = dates[~np.isclose(dates[:, None], times).any(axis=1)]
+    grid = np.unique(np.concatenate((times, new)))
+
+    log_zcb = np.interp(grid, np.concatenate(([0.0], times)),
+                        np.concatenate(([0.0], np.log(zcb))))
+
+    prices = np.exp(log_zcb)
+    prices[np.searchsorted(grid, times)] = zcb  # pillars kept as quoted
+
+    return grid, prices
+
+
+class _ShortRateTree(object):
+    """
+    Calibration shared by HoLee and BlackDermanToy (see their docstrings)
+
+    --------------------------------
+    Note:
+        Subclasses provide forward_tree (fsolve calibration) and
+        _fit_forward (Arrow-Debreu forward induction from a column).
+
+        Column i covers dts[i]; nodes are 2 sigma sqrt(dt_max) apart,
+        column i moves up with probability probs[i] (see up_probability).
+    """
+
+    def __init__(self, zcb, T,  sigma, method="forward", cache=None, times=None):
+
+        self.zcb = np.array(zcb, dtype=float)  # Array (or scenarios x maturities)
+        self.n = self.zcb.shape[-1]
+        self.T = T
+        self.sigma = sigma  # Annualised volatility (of log rates for BDT)
+        self.method = method  # calibration: "fsolve" or "forward"
+        self._set_grid(T, times)
+
+        self.rates = TriangularLattice(self.n, batch_shape=self.zcb.shape[:-1])
+        self.thetas = np.nan  # store theta's value once calibrated
+        self._q = None  # Arrow-Debreu state prices (forward calibration)
+
+        # if ZCB > 1 ==> ZCB quoted per $100.
+        if np.any(self.zcb[..., -1] > 1.0):
+            self.zcb /= 100
+
+        # Extract first interest rate (Trivial)
+        self.rates[0, 0] = -np.log(self.zcb[..., 0])/self.dts[0]
+
+        if cache is None:
+            self.fit_theta()
+        else:
+            # same curve ==> same thetas and (read-only) rate tree
+            key = cache.key(type(self).__name__, self.zcb, self.dts,
+                            self.sigma, self.method)
+            thetas, self.rates = cache.get(key, self._calibrate)
+            self.thetas = list(thetas)
+
+    def _fit_fsolve(self):
+        """
+        Find theta parameters one by one with fsolve, repricing the
+        full tree (forward_tree) for each
+        """
+        if self.zcb.ndim > 1:
+            raise ValueError("scenario batch: use method='forward'")
+
+        from scipy.optimize import fsolve  # solver
+
+        thetas = []
+
+        r0 = self.rates[0, 0]
+
+        name = type(self).__name__
+        for i in self.zcb[1:]:
+            p0 = i
+            func = (lambda t: self.forward_tree(
+                r0, self.sigma, self.dts, thetas+[t[0]])[1][0, 0]-p0)
+            new_theta = fsolve(instrument.counted(name + ".evaluations", func), 0.001)
+            instrument.count(name + ".solves")
+            thetas.append(new_theta[0])
+
+        self.thetas = thetas
+        self.rates = self.forward_tree(r0, self.sigma, self.dts, thetas)[0]
+
+    @property
+    def probs(self):
+        """
+        Up move probability of each column (0.5 on a uniform grid)
+        """
+        return up_probability(self.dts)
+
+    def _set_grid(self, T, times):
+        """
+        Time step of each column: T/n, or steps between the maturities
+        """
+        if times is None:
+            self.times = None
+            self.dt = T/self.n
+            self.dts = np.full(self.n, self.dt)
+            return
+
+        self.times = np.asarray(times, dtype=float)
+        self.dts = np.diff(self.times, prepend=0.0)
+        if len(self.times) != self.n or np.any(self.dts <= 0):
+            raise ValueError("times: one increasing maturity (> 0) per ZCB")
+
+        self.T = self.times[-1]
+        self.dt = None  # no single step: see dts
+
+    def _calibrate(self):
+        """
+        fit_theta, returning (thetas, rates) for the cache
+        """
+        self.fit_theta()
+        return np.array(self.thetas), self.rates
+
+    def _init_forward(self, start):
+        """
+        Make sure thetas and state prices up to column start exist
+        (rebuilt from the rate tree if calibrated with fsolve)
+        """
+        if np.ndim(self.thetas) == 0:
+            self.thetas = [np.nan] * (self.n - 1)
+        if self._q is None:
+            self._q = state_prices(self.rates, self.dts, self.n - 1, self.probs)
+
+    @instrument.timed
+    def update_zcb(self, indices, new_prices):
+        """
+        Recalibrate after a move of part of the ZCB curve
+        ==============================
+        Args:
+            indices (int / array): position of the ZCB that moved
+            new_prices (float / array): new ZCB prices
+                (scenarios x indices for a scenario batch)
+
+        =========================
+        Thetas (and rate tree columns) before the first changed
+        maturity are kept: only the remaining ones are solved again,
+        with Arrow-Debreu forward induction (BDT: each Newton
+        started from its previous value).
+        """
+        indices = np.atleast_1d(indices)
+        new_prices = np.atleast_1d(np.asarray(new_prices, dtype=float))
+
+        # ZCB quoted per $100.
+        self.zcb[..., indices] = np.where(new_prices > 1.0, new_prices / 100, new_prices)
 
-# solver
-from scipy.optimize import fsolve
+        if not self.rates.data.flags.writeable: # shared by a cache
+            self.rates = self.rates.copy()
 
+        start = max(indices.min() - 1, 0)
+        if indices.min() == 0:
+            self.rates[0, 0] = -np.log(self.zcb[..., 0])/self.dts[0]
 
-class HoLee(object):
+        self._fit_forward(start)
+
+
+class HoLee(_ShortRateTree):
 
     '''
     Class to calibrate Binamial Tree to fit the interest rate
@@ -17,39 +283,25 @@ class HoLee(object):
     dt: T/n
     zcb: array, price of zero coupon bonds.
         Make sure these are ZCB. Only check is if zcb >1, then devide by 100.
+        (scenarios x maturities) matrix: all curves calibrated together
+        (method="forward"), rates is then a stacked TriangularLattice
 
     sigma = Annualised Volatility (standard deviation)
+    method: "forward" (default) Arrow-Debreu forward induction, O(n^2),
+                each theta in closed form (no solver, numpy only)
+            "fsolve" full tree repriced for each theta (scipy)
+    cache: optional cache.LatticeCache (thetas and rates shared by
+           every object built on the same curve)
+    times: optional maturities of the ZCB (years, increasing, T ignored):
+           one column per pillar, steps may differ (see up_probability).
+           Cash-flow dates between pillars are added with time_grid:
+           times, zcb = time_grid(pillars, zcb, coupon_dates)
 
     =============================
-    Assumption: dt is constant
-    Future development ideas:
-        If dt between each price not constant,
-        implement raw interpolation
+    Default: dt = T/n is constant
 
     '''
 
-    def __init__(self, zcb, T,  sigma):
-
-        self.zcb = np.array(zcb)  # Array
-        self.n = len(self.zcb)
-        self.T = T
-        self.sigma = sigma  # Annualised volatility
-        self.dt = T/self.n
-
-        self.rates = np.zeros((self.n, self.n))
-        self.thetas = np.nan  # store theta's value once calibrated
-
-        # if ZCB > 1 ==> ZCB quoted per $100.
-        if self.zcb[-1] > 1.0:
-            self.zcb /= 100
-
-        # Extract first interest rate (Trivial)
-        self.rates[0, 0] = -np.log(self.zcb[0])/self.dt
-
-        self.fit_theta()
-
-        # Ideas, if dt not fixed, insert array along zcb to have time.
-
     @staticmethod
     def forward_tree(r0, sigma, dt, thetas):
         """
@@ -59,11 +311,12 @@ class HoLee(object):
         Args:
             r0 (float): _description_
             sigma (float): _description_
-            dt (float): _description_
+            dt (float / array): time step (or one per column, the
+                model's dts: node spacing and probabilities use them all)
             thetas (array / list): _description_
 
         Returns:
-             nxn array: interest rates
+             TriangularLattice: interest rates, ZCB
 
         =========================
         Uses backward tree for Bond evaluation
@@ -71,31 +324,37 @@ class HoLee(object):
         backward_tree method
         """
         n = len(thetas)
-        tree_rate = np.zeros((n+1, n+1))
+        dt = np.full(n+1, dt) if np.ndim(dt) == 0 else np.asarray(dt, dtype=float)
+        p = up_probability(dt)
+        step = sigma * np.sqrt(longest_step(dt))  # half the node spacing
+        tree_rate = TriangularLattice(n+1)
         tree_rate[0, 0] = r0
-        tree_zcb = np.zeros((n+2, n+2))
+        tree_zcb = TriangularLattice(n+2)
         tree_zcb[:, -1] = 1.0  # Could be 100.0
 
         for i in range(n):
-            tree_rate[0, i+1] = tree_rate[0, i] + thetas[i] * dt \
-                + sigma * np.sqrt(dt)
+            tree_rate[0, i+1] = tree_rate[0, i] + thetas[i] * dt[i] \
+                + 2 * (1 - p[i]) * step
 
             # Vectorise calculation by -2 sigma on each row
             # (column-wise operation)
 
             # ignore first row (already calculated)
             tree_rate[1:i+2, i+1] = tree_rate[0, i+1] \
-                - 2 * np.arange(1, i+2) * sigma * np.sqrt(dt)
+                - 2 * np.arange(1, i+2) * step
 
         # Calculate ZCB backward
 
         for i in np.arange(n, -1, -1):
 
-            tree_zcb[0:i+1, i] = np.exp(-tree_rate[:i+1, i] * dt) \
-                * 0.5 * (tree_zcb[0:i+1, i+1] + tree_zcb[1:i+2, i+1])
+            tree_zcb[0:i+1, i] = np.exp(-tree_rate[:i+1, i] * dt[i]) \
+                * (p[i] * tree_zcb[0:i+1, i+1] + (1 - p[i]) * tree_zcb[1:i+2, i+1])
+
+        instrument.alloc("HoLee.forward_tree", tree_rate.nbytes + tree_zcb.nbytes)
 
         return tree_rate, tree_zcb
 
+    @instrument.timed
     def fit_theta(self):
         """
         Find theta parameters
@@ -112,22 +371,48 @@ class HoLee(object):
         Great ressource: 
         https://www.bensblog.tech/fixed_income/HoLee_Model/
         """
-        thetas = []
+        if self.method == "forward":
+            return self._fit_forward()
+        self._fit_fsolve()
 
-        r0 = self.rates[0, 0]
+    def _fit_forward(self, start=0):
+        """
+        Find theta parameters with Arrow-Debreu forward induction
+        -------------------------
+        With Q the state prices of column i+1 and rates
+        r_j = a - 2 j s (row j, s = sigma sqrt(dt_max), see up_probability):
+            zcb[i+1] = sum_j Q_j exp(-r_j dt_i+1)
+                     = exp(-a dt_i+1) sum_j Q_j exp(2 j s dt_i+1)
+        gives the top rate a, hence theta, in closed form
+        (s = sigma sqrt(dt) if the grid is uniform). Total cost O(n^2).
+        Scenarios (leading axis of zcb) are solved in the same pass.
+
+        start: first theta to fit (columns <= start of the rate tree
+        are kept, see update_zcb)
+        """
+        dts, probs = self.dts, self.probs
+        step = self.sigma * np.sqrt(longest_step(dts))  # half the node spacing
+        self._init_forward(start)
 
-        for i in self.zcb[1:]:
-            p0 = i
-            func = (lambda t: self.forward_tree(
-                r0, self.sigma, self.dt, thetas+[t])[1][0, 0]-p0)
-            new_theta = fsolve(func, 0.001)
-            thetas.append(new_theta[0])
+        q = self._q[start]
+        rates = self.rates[:start+1, start]
 
-        self.thetas = thetas
-        self.rates = self.forward_tree(r0, self.sigma, self.dt, thetas)[0]
+        for i in range(start, self.n - 1):
+            q = arrow_debreu(q, rates, dts[i], probs[i])
+            j = np.arange(i+2)
+
+            top = np.log(np.sum(q * np.exp(2 * j * step * dts[i+1]), axis=-1)
+                         / self.zcb[..., i+1]) / dts[i+1]
+            self.thetas[i] = (top - rates[..., 0] - 2 * (1 - probs[i]) * step) / dts[i]
+            rates = np.expand_dims(top, -1) - 2 * j * step
 
+            self._q[i+1] = q
+            self.rates[:i+2, i+1] = rates
 
-class BlackDermanToy(object):
+        instrument.count(type(self).__name__ + ".iterations", self.n - 1 - start)
+
+
+class BlackDermanToy(_ShortRateTree):
 
     '''
     Class to calibrate Binamial Tree to fit the interest rate
@@ -137,39 +422,27 @@ class BlackDermanToy(object):
     T: number of years. 
     dt: T/n
     zcb: array, price of zero coupon bonds. 
+        (scenarios x maturities) matrix: all curves calibrated together
+        (method="forward"), rates is then a stacked TriangularLattice
 
     sigma = vol of log interest rate!(standard deviation)
+    method: "forward" (default) Arrow-Debreu forward induction, O(n^2),
+                each theta solved by Newton (analytic derivative)
+            "fsolve" full tree repriced for each theta (scipy)
+    cache: optional cache.LatticeCache (thetas and rates shared by
+           every object built on the same curve)
+    times: optional maturities of the ZCB (years, increasing, T ignored):
+           one column per pillar, steps may differ (see up_probability).
+           Cash-flow dates between pillars are added with time_grid:
+           times, zcb = time_grid(pillars, zcb, coupon_dates)
 
     =============================
-    Assumption: dt is constant
-    Future development ideas: 
-        If dt between each price not constant, 
-        implement raw interpolation  
+    Default: dt = T/n is constant
 
     =============================
 
     '''
 
-    def __init__(self, zcb, T,  sigma):
-
-        self.zcb = np.array(zcb)  # Array
-        self.n = len(self.zcb)
-        self.T = T
-        self.sigma = sigma  # vol of log interest rate!
-        self.dt = T/self.n
-
-        self.rates = np.zeros((self.n, self.n))
-        self.thetas = np.nan  # store theta's value once calibrated
-
-        # if ZCB > 1 ==> ZCB quoted per $100.
-        if self.zcb[-1] > 1.0:
-            self.zcb /= 100
-
-        # Extract first interest rate (Trivial)
-        self.rates[0, 0] = -np.log(self.zcb[0])/self.dt
-
-        self.fit_theta()
-
     @staticmethod
     def forward_tree(r0, sigma, dt, thetas):
         """
@@ -177,11 +450,12 @@ class BlackDermanToy(object):
         Args:
             r0 (float): _description_
             sigma (float): _description_
-            dt (float): _description_
+            dt (float / array): time step (or one per column, the
+                model's dts: node spacing and probabilities use them all)
             thetas (array / list): _description_
 
         Returns:
-             nxn array: interest rates
+             TriangularLattice: interest rates, ZCB
 
         =========================
         Uses backward tree for Bond evaluation
@@ -189,38 +463,41 @@ class BlackDermanToy(object):
         backward_tree method
         """
         n = len(thetas)
-        tree_rate = np.zeros((n+1, n+1))
+        dt = np.full(n+1, dt) if np.ndim(dt) == 0 else np.asarray(dt, dtype=float)
+        p = up_probability(dt)
+        step = sigma * np.sqrt(longest_step(dt))  # half the node spacing
+        tree_rate = TriangularLattice(n+1)
         tree_rate[0, 0] = np.log(r0)
-        tree_zcb = np.zeros((n+2, n+2))
+        tree_zcb = TriangularLattice(n+2)
         tree_zcb[:, -1] = 1.0  # Could be 100.0
 
         for i in range(n):
-            tree_rate[0, i+1] = tree_rate[0, i] + thetas[i] * dt \
-                + sigma * np.sqrt(dt)
+            tree_rate[0, i+1] = tree_rate[0, i] + thetas[i] * dt[i] \
+                + 2 * (1 - p[i]) * step
 
             # Vectorise calculation by -2 sigma on each row
             # (column-wise operation)
 
             # ignore first row (already calculated)
             tree_rate[1:i+2, i+1] = tree_rate[0, i+1] \
-                - 2 * np.arange(1, i+2) * sigma * np.sqrt(dt)
+                - 2 * np.arange(1, i+2) * step
 
         # Calculate ZCB backward
 
         for i in np.arange(n, -1, -1):
 
             r = np.exp(tree_rate[:i+1, i])
-            tree_zcb[0:i+1, i] = np.exp(-r * dt) \
-                * 0.5 * (tree_zcb[0:i+1, i+1] + tree_zcb[1:i+2, i+1])
+            tree_zcb[0:i+1, i] = np.exp(-r * dt[i]) \
+                * (p[i] * tree_zcb[0:i+1, i+1] + (1 - p[i]) * tree_zcb[1:i+2, i+1])
 
         # z_i = ln(r_i) <=> r_i = exp(z_i)
-        # replace 1.0 by 0.0
         tree_rate = np.exp(tree_rate)
-        for i in range(len(tree_rate)):
-            tree_rate[i+1:, i] = 0
+
+        instrument.alloc("BlackDermanToy.forward_tree", tree_rate.nbytes + tree_zcb.nbytes)
 
         return tree_rate, tree_zcb
 
+    @instrument.timed
     def fit_theta(self):
         """
         Find theta parameters
@@ -238,37 +515,146 @@ class BlackDermanToy(object):
         Great ressource: 
         https://www.bensblog.tech/fixed_income/HoLee_Model/
         """
-        thetas = []
-        r0 = self.rates[0, 0]
+        if self.method == "forward":
+            return self._fit_forward()
+        self._fit_fsolve()
 
-        for i in self.zcb[1:]:
-            p0 = i
-            func = (lambda t: self.forward_tree(
-                r0, self.sigma, self.dt, thetas+[t])[1][0, 0]-p0)
-            new_theta = fsolve(func, .001)
-            thetas.append(new_theta[0])
+    def _fit_forward(self, start=0):
+        """
+        Find theta parameters with Arrow-Debreu forward induction
+        -------------------------
+        With Q the state prices of column i+1 and
+        z_j = a - 2 j s, r_j = exp(z_j) (row j, s = sigma sqrt(dt_max)):
+            zcb[i+1] = sum_j Q_j exp(-r_j dt_i+1)
+        is solved for the top log rate a by Newton (see _newton), over
+        the current column only, started from the theta already fitted
+        if any, else from the previous maturity's theta.
+        Total cost O(n^2). Scenarios (leading axis of zcb) are
+        solved together: one vectorised Newton step per column.
+
+        start: first theta to fit (columns <= start of the rate tree
+        are kept, see update_zcb)
+        """
+        dts, probs = self.dts, self.probs
+        step = self.sigma * np.sqrt(longest_step(dts))  # half the node spacing
+        self._init_forward(start)
+
+        q = self._q[start]
+        z = np.log(self.rates[:start+1, start])
+
+        for i in range(start, self.n - 1):
+            drift = 2 * (1 - probs[i]) * step  # top node move, theta aside
+            q = arrow_debreu(q, np.exp(z), dts[i], probs[i])
+            j = np.arange(i+2)
+            p0 = self.zcb[..., i+1]
+
+            # warm start: same theta (update_zcb) or previous maturity
+            theta = self.thetas[i]
+            if i > 0:
+                theta = np.where(np.isfinite(theta), theta, self.thetas[i-1])
+            theta = np.where(np.isfinite(theta), theta, 0.0)
+            guess = z[..., 0] + drift + theta * dts[i]
+
+            try:
+                top, evaluations = self._newton(q, -2 * j * step, p0, dts[i+1], guess)
+            except ValueError as exc:
+                raise ValueError("{}: cannot fit zcb[{}] (maturity {:g}): {}".format(
+                    type(self).__name__, i+1, np.sum(dts[:i+2]), exc)) from None
+            instrument.count(type(self).__name__ + ".evaluations", evaluations)
+            instrument.count(type(self).__name__ + ".solves")
+            self.thetas[i] = (top - z[..., 0] - drift) / dts[i]
+            z = np.expand_dims(top, -1) - 2 * j * step
+
+            self._q[i+1] = q
+            self.rates[:i+2, i+1] = np.exp(z)
 
-        self.thetas = thetas
-        self.rates = self.forward_tree(r0, self.sigma, self.dt, thetas)[0]
+    @staticmethod
+    def _newton(q, offsets, p0, dt, a, tol=1e-12, max_iter=50):
+        """
+        Top log rate a of a column matching the ZCB price
+        ==============================
+        Args:
+            q (array): state prices of the column (..., rows)
+            offsets (array): log rate of row j minus a (-2 j s, see _fit_forward)
+            p0 (float / array): ZCB price(s) to match (...)
+            dt (float): time step
+            a (float / array): starting point (...)
+
+        Returns:
+            (array, int): top log rate(s), number of evaluations
+
+        Raises:
+            ValueError: f or f' not finite (e.g. a price above the sum
+                of the state prices: negative forward rate, no lognormal
+                rate fits), or no convergence after max_iter steps
+
+        =========================
+        With r_j = exp(a + offsets_j) and d_j = Q_j exp(-r_j dt):
+            f(a)  = sum_j d_j - p0
+            f'(a) = -dt sum_j r_j d_j
+        f is decreasing and concave (r_j dt < 1), so Newton converges
+        monotonically from any start (2-4 steps from a warm start).
+        Leading axes of q / p0 / a (e.g. scenarios) are solved together.
+        """
+        a = np.asarray(a, dtype=float)
+        for k in range(1, max_iter + 1):
+            r = np.exp(a[..., None] + offsets)
+            d = q * np.exp(-r * dt)
+
+            f = np.sum(d, axis=-1) - p0
+            jac = -dt * np.sum(r * d, axis=-1)
+            if not (np.all(np.isfinite(f)) and np.all(np.isfinite(jac)) and np.all(jac < 0)):
+                raise ValueError("Newton step {}: ZCB price or derivative not finite".format(k))
+
+            delta = f / jac
+            a = a - delta
+            if not np.all(np.isfinite(a)):
+                raise ValueError("Newton step {}: log rate not finite".format(k))
+            # step below tol, or price already matched to rounding
+            # (tiny dt: the step then oscillates around tol)
+            matched = np.abs(f) <= 4 * np.finfo(float).eps * np.abs(p0)
+            if np.all((np.abs(delta) <= tol * np.maximum(np.abs(a), 1.0)) | matched):
+                return a, k
+
+        raise ValueError("no convergence after {} Newton steps".format(max_iter))
 
 
 class Option_IR:
 
     def __init__(self, rate_obj, T, n):
-        ''' in case I need to write something'''
+        ''' in case I need to write something
+
+        On a rate_obj built with times=..., columns keep the steps and
+        up probabilities of the grid (T ignored): one coupon per grid
+        period, accrued over its own step.
+
+        On stacked rate trees (rate_obj calibrated on a scenarios x
+        maturities ZCB matrix), every tree is priced in the same backward
+        induction: tree[0, 0] and c_swap hold one value per scenario.
+        strip and swaption_grid need a single curve.
+        '''
 
         self.T = T          # Years
         self.n = n          # n
 
-        self.dt = T/n
+        if getattr(rate_obj, "times", None) is None:
+            self.dt = T/n
+            self.dts = np.full(n+1, self.dt)
+            self.probs = np.full(n+1, 0.5)
+        else:
+            self.dt = None  # no single step: see dts
+            self.dts = rate_obj.dts[:n+1]
+            self.probs = rate_obj.probs[:n+1]  # up move of each column
+            self.T = rate_obj.times[n-1] if n > 0 else 0.0
 
         self.rate_obj = rate_obj
         self.zcb = rate_obj.zcb
-        self.tree_rates = rate_obj.rates[:n+1, :n+1]  # no need for self here
+        self.tree_rates = rate_obj.rates.truncate(n+1)  # no need for self here
 
         # Set fair swap rate
         self.c_swap = self._swap_rate()
 
+    @instrument.timed
     def cash_flow(self, c=np.nan, notional=100.0, otype="cap"):
         """
         Calculate Binomial tree for a cap
@@ -278,21 +664,20 @@ class Option_IR:
         return: tree cash flow
         """
 
-        tree_ctns = self.ctns_rate(self.tree_rates, self.dt)
+        dt = self._node_dt(self.n+1)
+        tree_ctns = self.ctns_rate(self.tree_rates, dt)
+        c = self._stacked(c)
 
         # create an empty array for Cash-Flow tree
-        tree_cf = np.zeros((self.n+1, self.n+1))
+        tree_cf = TriangularLattice(self.n+1)
         if otype == "cap":
-            tree_cf = self.dt * notional * np.maximum(tree_ctns - c, 0)
+            tree_cf = dt * notional * np.maximum(tree_ctns - c, 0)
 
         elif otype == "floor":
-            tree_cf = self.dt * notional * np.maximum(c - tree_ctns, 0)
+            tree_cf = dt * notional * np.maximum(c - tree_ctns, 0)
 
         elif otype == "swap":
-            tree_cf = self.dt * notional * (tree_ctns - c)
-
-            for i in range(self.n):
-                tree_cf[i+1:, i] = 0
+            tree_cf = dt * notional * (tree_ctns - c)
 
         else:
             print("No option type inputed, \n Please choose:")
@@ -300,38 +685,172 @@ class Option_IR:
             return
         return tree_cf
 
+    @instrument.timed
     def option(self, c, notional, otype="cap"):
 
         cash_flow = self.cash_flow(c, notional, otype)
 
         rates = self.tree_rates
 
-        tree = self.backward_tree(cash_flow, rates, self.dt)
+        tree = self.backward_tree(cash_flow, rates, self._node_dt(self.n+1), self.probs)
 
         return tree
 
+    @instrument.timed
+    def strip(self, c, otype="cap", notional=100.0, caplets=False):
+        """
+        Price a strip of caps / floors on the same rate tree at once
+        ==============================
+        Args:
+            c (float / array): strikes
+            otype (str / array): "cap" or "floor" (one per strike)
+            notional (float / array): (=N in the formula)
+            caplets (bool): also return the value of each caplet / floorlet
+
+        Returns:
+            array: price of each cap / floor
+            (array, array): prices and caplet values (strikes x n+1),
+                if caplets
+
+        =========================
+        Continuously compounded tree computed once, a single backward
+        induction over the stacked (strikes x nodes) cash flows.
+        Caplet k is valued with the Arrow-Debreu state prices of column k.
+        """
+        self._single_curve()
+        c, otype, notional = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(c, dtype=float)), otype,
+            np.asarray(notional, dtype=float))
+        unknown = set(otype.tolist()) - {"cap", "floor"}
+        if unknown:
+            raise ValueError("otype must be 'cap' or 'floor', got {}".format(sorted(unknown)))
+        sign = np.where(otype == "floor", -1.0, 1.0)[:, None]
+
+        dt = self._node_dt(self.n+1)
+        tree_ctns = self.ctns_rate(self.tree_rates, dt)
+
+        # (strikes x nodes) cash flows
+        tree_cf = dt * notional[:, None] * np.maximum(sign * (tree_ctns - c[:, None]), 0)
+
+        tree = self.backward_tree(tree_cf, self.tree_rates, dt, self.probs)
+
+        if not caplets:
+            return tree[0, 0]
+
+        q = state_prices(self.tree_rates, self.dts, self.n, self.probs)
+        values = np.column_stack([
+            (tree_cf[:, i] * q[i] * np.exp(-self.tree_rates[:, i] * self.dts[i])).sum(axis=-1)
+            for i in range(self.n+1)])
+
+        return tree[0, 0], values
+
     def fair_swap(self):
 
         return self.option(self.c_swap, 100, "swap")
 
+    @instrument.timed
     def swaption(self, t):
 
         a = self.fair_swap()
 
-        a = a[:t+1, :t+1]
-        a[:, -1] = np.where(a[:, -1]-self.c_swap > 0, a[:, -1], 0)
+        a = a.truncate(t+1)
+        a[:, -1] = self._exercise(a[:, -1], self._stacked(self.c_swap))
 
-        tree = np.zeros((t+1, t+1))
+        tree = TriangularLattice(t+1, batch_shape=a.data.shape[:-1])
         # intresic value
         tree[:, -1] = a[:, -1]
 
-        p = 0.5
         for i in range(t, 0, -1):
-            tree[:i, i-1] = np.exp(-self.tree_rates[:i, i-1] * self.dt) \
+            p = self.probs[i-1]
+            tree[:i, i-1] = np.exp(-self.tree_rates[:i, i-1] * self.dts[i-1]) \
                 * ((p * tree[:i, i] + (1-p) * tree[1:i+1, i]))
 
         return tree
 
+    @instrument.timed
+    def swaption_grid(self, expiries=None, tenors=None, bermudan=False):
+        """
+        Swaption prices for every expiry x tenor
+        ==============================
+        Args:
+            expiries (array): exercise dates, in time steps
+                (default 0 ... n)
+            tenors (array): swap lengths, in time steps
+                (default 1 ... n), i.e. Option_IR(rate_obj, k*dt, k)
+            bermudan (bool): exercise allowed at any time step
+                up to the expiry
+
+        Returns:
+            np.array: (expiries x tenors) prices at time 0,
+                nan if expiry > tenor
+
+        =========================
+        One swap value tree per tenor (fair swap rate of that tenor),
+        reused for every expiry: all expiries of a tenor are rolled
+        back together. For the full tenor n,
+        grid[t, -1] == swaption(t)[0, 0].
+        """
+        self._single_curve()
+        expiries = np.arange(self.n+1) if expiries is None else np.asarray(expiries)
+        tenors = np.arange(1, self.n+1) if tenors is None else np.asarray(tenors)
+
+        grid = np.full((len(expiries), len(tenors)), np.nan)
+        tree_ctns = self.ctns_rate(self.tree_rates, self._node_dt(self.n+1))
+
+        for col, k in enumerate(tenors):
+            rates = self.tree_rates.truncate(k+1)
+            dt = self._node_dt(k+1)
+            c = self._fair_rate(k+1)
+
+            cash_flow = dt * 100.0 * (tree_ctns.truncate(k+1) - c)
+            swap = self.backward_tree(cash_flow, rates, dt, self.probs[:k+1])
+
+            valid = expiries <= k
+            if valid.any():
+                grid[valid, col] = self._roll_swaptions(
+                    swap, rates, c, expiries[valid], bermudan)
+
+        return grid
+
+    def _roll_swaptions(self, swap, rates, c, expiries, bermudan):
+        """
+        Swaptions on one swap value tree, all expiries rolled back
+        together over a stacked (expiries x nodes) array
+        """
+        m = expiries.max()
+        expiries = expiries[:, None]
+
+        values = np.zeros((len(expiries), m+2))
+        for i in range(m, -1, -1):
+            p = self.probs[i]
+            payoff = self._exercise(swap[:i+1, i], c)
+
+            wait = np.exp(-rates[:i+1, i] * self.dts[i]) \
+                * (p * values[:, :i+1] + (1-p) * values[:, 1:i+2])
+            if bermudan:
+                wait = np.maximum(wait, payoff)
+
+            values[:, :i+1] = np.where(expiries == i, payoff,
+                                       np.where(expiries > i, wait, 0.0))
+
+        return values[:, 0]
+
+    def _node_dt(self, k):
+        """
+        Time step of each node of the first k columns: dt on a
+        uniform grid, else a TriangularLattice (step of its column)
+        """
+        if self.dt is not None:
+            return self.dt
+        return TriangularLattice(k, np.repeat(self.dts[:k], np.arange(1, k+1)))
+
+    @staticmethod
+    def _exercise(swap, c):
+        """
+        Swaption exercise value on the swap value tree
+        """
+        return np.where(swap - c > 0, swap, 0)
+
     def _swap_rate(self):
         """
         Find Fair swap rate analytically
@@ -351,10 +870,30 @@ class Option_IR:
 
         k = len(self.tree_rates)
 
-        self.c_swap = 1/self.dt * (1-self.zcb[k-1]) / (sum(self.zcb[:k]))
+        self.c_swap = self._fair_rate(k)
 
         return self.c_swap
 
+    def _fair_rate(self, k):
+        """
+        Fair swap rate over the first k periods:
+        (1 - P_k) / sum_i dt_i P_i  (= 1/dt (1 - P_k) / sum_i P_i if dt constant)
+        """
+        return (1 - self.zcb[..., k-1]) / np.sum(self.dts[:k] * self.zcb[..., :k], axis=-1)
+
+    @staticmethod
+    def _stacked(c):
+        """
+        One rate per stacked tree (e.g. c_swap per scenario),
+        broadcast against the nodes
+        """
+        return np.expand_dims(c, -1) if np.ndim(c) else c
+
+    def _single_curve(self):
+        if self.tree_rates.data.ndim > 1:
+            raise ValueError("single curve only: price stacked rate trees with option()")
+
+    @instrument.timed
     def fit_swap_rate(self):
         """
         Depreciated: 
@@ -370,35 +909,44 @@ class Option_IR:
             float: fair swap rate
         """
 
+        from scipy.optimize import fsolve  # solver
+
         # Notional amount is irrelevant
-        func = (lambda t: self.option(t, 1.0, "swap")[0, 0])
+        func = (lambda t: self.option(t[0], 1.0, "swap")[0, 0])
         c = fsolve(func, 0.001)
         self.swap_rate = c[0]
         return c[0]
 
     @staticmethod
-    def backward_tree(tree_cf, tree_rates, dt):
+    def backward_tree(tree_cf, tree_rates, dt, probs=0.5):
         """
         Calculate whole tree backward
         ==============================
         Args:
-            tree_cf (nxn np.array): Cash Flow
-            tree_rates (nxn np.array): rates from Ho Lee or Black Derman Toy
-            dt (float): time step (assume constant)
+            tree_cf (TriangularLattice): Cash Flow
+                (may hold several stacked trees, e.g. one per strike)
+            tree_rates (TriangularLattice): rates from Ho Lee or Black Derman Toy
+            dt (float / TriangularLattice): time step (or one per node)
+            probs (float / array): up move probability (or one per column)
 
         Returns:
-            _type_: _description_
+            TriangularLattice: value tree (stacked as tree_cf)
         """
         n = len(tree_rates)
-        p = 0.5  # probability
+        probs = np.broadcast_to(probs, (n,))  # probability
+
+        # stacked cash flows (e.g. one per strike) => stacked values
+        tree_eu = TriangularLattice(n, batch_shape=tree_cf.data.shape[:-1])
+        instrument.alloc("Option_IR.backward_tree", tree_eu.nbytes)
 
-        tree_eu = np.zeros((n, n))
+        disc = np.exp(-tree_rates * dt)
 
         # intresic value
-        tree_eu[:, -1] = np.exp(-tree_rates[:, -1] * dt) * tree_cf[:, -1]
+        tree_eu[:, -1] = disc[:, -1] * tree_cf[:, -1]
 
         for i in range(n-1, 0, -1):
-            tree_eu[:i, i-1] = np.exp(-tree_rates[:i, i-1] * dt) \
+            p = probs[i-1]
+            tree_eu[:i, i-1] = disc[:i, i-1] \
                 * ((p * tree_eu[:i, i] + (1-p) * tree_eu[1:i+1, i])
                     + tree_cf[:i, i-1])
 
@@ -0,0 +1,237 @@
+"""
+On-disk store of calibrated short-rate lattices (HoLee, BlackDermanToy).
+"""
+
+import hashlib
+import json
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from cache import LatticeCache
+from lattice import TriangularLattice
+from short_interest_rate import HoLee, BlackDermanToy
+
+MAGIC = b"SRLATICE"
+VERSION = 1          # file format version, bumped on any layout change
+ALIGN = 64           # arrays start on 64 byte boundaries
+
+MODELS = {"HoLee": HoLee, "BlackDermanToy": BlackDermanToy}
+
+# file: MAGIC | version (uint32) | header length (uint32) | JSON header |
+#       padding | arrays (little-endian float64, C order, aligned)
+# array offsets in the header are relative to the first array
+_PREFIX = struct.Struct("<8sII")
+
+
+def curve_key(model, zcb, T, sigma, method, times=None):
+    """
+    Hex digest identifying a calibration (model name, ZCB curve, time
+    steps, sigma, method): same inputs as the LatticeCache key
+    ==============================
+    Args:
+        model (str / class): "HoLee" or "BlackDermanToy"
+        zcb, T, sigma, method, times: as in HoLee / BlackDermanToy
+
+    Returns:
+        str: 32 hexadecimal characters
+    """
+    name = model if isinstance(model, str) else model.__name__
+    zcb = np.array(zcb, dtype=float)
+    if np.any(zcb[..., -1] > 1.0): # ZCB quoted per $100.
+        zcb /= 100
+
+    n = zcb.shape[-1]
+    if times is None:
+        dts = np.full(n, T / n)
+    else:
+        dts = np.diff(np.asarray(times, dtype=float), prepend=0.0)
+
+    return _digest(LatticeCache.key(name, zcb, dts, sigma, method))
+
+
+def _digest(key):
+    return hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+
+
+def save(model, path):
+    """
+    Write a calibrated HoLee / BlackDermanToy to path
+    ==============================
+    Args:
+        model: calibrated HoLee / BlackDermanToy (scenario batches too)
+        path (str): file written (atomically: replaced once complete)
+
+    Returns:
+        str: curve key of the model (see curve_key)
+    """
+    name = type(model).__name__
+    if name not in MODELS:
+        raise ValueError("only HoLee / BlackDermanToy can be stored, not " + name)
+
+    key = _digest(LatticeCache.key(name, model.zcb, model.dts, model.sigma,
+                                   model.method))
+
+    arrays = {"zcb": model.zcb, "dts": model.dts,
+              "thetas": np.asarray(model.thetas, dtype=float),
+              "rates": model.rates.data}
+    if model.times is not None:
+        arrays["times"] = model.times
+    arrays = {k: np.ascontiguousarray(v, dtype="<f8") for k, v in arrays.items()}
+
+    header = {"model": name, "key": key, "sigma": float(model.sigma),
+              "method": model.method, "n": model.n,
+              "T": float(np.asarray(model.T)), "arrays": {}}
+
+    offset = 0
+    for k, v in arrays.items():
+        header["arrays"][k] = {"offset": offset, "shape": list(v.shape)}
+        offset = _aligned(offset + v.nbytes)
+
+    text = json.dumps(header, sort_keys=True).encode()
+    start = _aligned(_PREFIX.size + len(text))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_PREFIX.pack(MAGIC, VERSION, len(text)))
+            f.write(text)
+            for k, v in arrays.items():
+                f.write(b"\0" * (start + header["arrays"][k]["offset"] - f.tell()))
+                f.write(v.tobytes())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+    return key
+
+
+def load(path, key=None):
+    """
+    Calibrated HoLee / BlackDermanToy from a file written by save
+    ==============================
+    Args:
+        path (str): file
+        key (str): expected curve key (ValueError if the file holds
+            another calibration)
+
+    Returns:
+        HoLee / BlackDermanToy, no recalibration: thetas and the rate
+        tree are read-only views of the memory-mapped file
+    """
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+
+    magic, version, size = _PREFIX.unpack(bytes(data[:_PREFIX.size]))
+    if magic != MAGIC:
+        raise ValueError("{} is not a lattice store file".format(path))
+    if version != VERSION:
+        raise ValueError("{}: format version {} (supported: {})".format(
+            path, version, VERSION))
+
+    header = json.loads(bytes(data[_PREFIX.size:_PREFIX.size + size]).decode())
+    if key is not None and header["key"] != key:
+        raise ValueError("{}: holds curve {}, not {}".format(path, header["key"], key))
+
+    start = _aligned(_PREFIX.size + size)
+    arrays = {}
+    for k, spec in header["arrays"].items():
+        shape = tuple(spec["shape"])
+        begin = start + spec["offset"]
+        end = begin + 8 * int(np.prod(shape))
+        arrays[k] = data[begin:end].view("<f8").reshape(shape)
+
+    model = MODELS[header["model"]].__new__(MODELS[header["model"]])
+    model.zcb = np.array(arrays["zcb"])  # small, writable (update_zcb)
+    model.n = header["n"]
+    model.T = header["T"]
+    model.sigma = header["sigma"]
+    model.method = header["method"]
+    model.dts = arrays["dts"]
+    if "times" in arrays:
+        model.times = arrays["times"]
+        model.dt = None  # no single step: see dts
+    else:
+        model.times = None
+        model.dt = model.T / model.n
+
+    model.rates = TriangularLattice(model.n, arrays["rates"])
+    model.thetas = list(arrays["thetas"])
+    model._q = None
+    return model
+
+
+class LatticeStore:
+    """
+    Directory of calibrated short-rate lattices, one file per curve key
+
+    --------------------------------
+    Note:
+        store = LatticeStore("lattices/")
+        bdt = store.get(BlackDermanToy, zcb, T, sigma)
+        Option_IR(bdt, T, n).option(c, 100, "cap")
+
+        The first get calibrates and saves (file named after the
+        model and curve_key), the next ones (in any process) only map
+        the file: no recalibration, and every process pricing on the
+        same curve shares the same read-only pages (OS page cache).
+        Process pool workers should call store.get / load themselves
+        (e.g. in the initializer): a pickled model carries copies.
+
+        update_zcb on a loaded model copies the rate tree first (as for
+        LatticeCache): the file is never modified.
+        Counters: hits (files mapped), misses (calibrations).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, model, zcb, T, sigma, method="forward", times=None):
+        """
+        File of a calibration (existing or not)
+        """
+        return self._path(model, curve_key(model, zcb, T, sigma, method, times))
+
+    def _path(self, model, key):
+        name = model if isinstance(model, str) else model.__name__
+        return os.path.join(self.directory, "{}-{}.lat".format(name, key))
+
+    def get(self, model, zcb, T, sigma, method="forward", times=None):
+        """
+        Calibrated model loaded from the store (calibrated and saved
+        first if missing)
+        ==============================
+        Args:
+            model (class): HoLee or BlackDermanToy
+            zcb, T, sigma, method, times: as in HoLee / BlackDermanToy
+
+        Returns:
+            HoLee / BlackDermanToy (memory-mapped, see load)
+        """
+        key = curve_key(model, zcb, T, sigma, method, times)
+        path = self._path(model, key)
+
+        if os.path.exists(path):
+            self.hits += 1
+            return load(path, key)
+
+        self.misses += 1
+        save(model(zcb, T, sigma, method=method, times=times), path)
+        return load(path, key)
+
+    def stats(self):
+        """
+        Counters as a dict
+        """
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def _aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
@@ -0,0 +1,253 @@
+"""
+Asyncio streaming repricer: spot / vol / curve ticks in, latest prices out.
+"""
+
+import asyncio
+import functools
+import time
+from collections import deque
+
+import numpy as np
+
+from option_param import Parameters
+from crr import BinomialTree
+from short_interest_rate import HoLee, BlackDermanToy, Option_IR
+
+
+class StreamingRepricer:
+    """
+    Reprice subscribed instruments on every input tick
+
+    --------------------------------
+    Note:
+        repricer = StreamingRepricer(callback=print)
+        repricer.subscribe("put_100", equity_option(100, 1.0),
+                           {"stock": "AAPL", "vol": "AAPL.vol", "rate": "USD.r"})
+        repricer.subscribe("cap", cap(T=4.5, n=9, c=0.03, sigma=0.2),
+                           {"zcb": "USD.zcb"})
+        await repricer.consume(queue)   # (key, value) ticks, None to stop
+
+        Each instrument has at most one pricing in flight (executor,
+        default: the loop's thread pool). Ticks arriving meanwhile are
+        coalesced: one new pricing on the latest inputs once it returns.
+        A result computed on inputs that have moved since is dropped
+        (stale) and priced again on the latest inputs; after max_drops
+        drops in a row it is published anyway, so a continuous stream
+        cannot starve an instrument (max_drops=None: always dropped).
+        Optional window (seconds) waits before each pricing to gather a
+        burst of ticks.
+
+        obj.latest holds the last published price per instrument,
+        callback(name, price) is called on each publication.
+        Latency = first tick not yet reflected in a price -> publication,
+        see obj.percentiles().
+
+        tick() must run in the event loop thread; from another thread:
+        loop.call_soon_threadsafe(repricer.tick, key, value)
+    """
+
+    def __init__(self, executor=None, window=0.0, max_drops=2, callback=None,
+                 history=10000):
+        self.executor = executor  # None ==> default executor of the loop
+        self.window = window      # seconds waited to coalesce a burst
+        self.max_drops = max_drops  # stale results dropped in a row
+        self.callback = callback  # callback(name, price)
+
+        self.state = {}         # stream key: latest value
+        self.latest = {}        # instrument: latest published price
+        self.errors = {}        # instrument: last pricing exception
+        self.latency = deque(maxlen=history)  # seconds, tick -> publication
+
+        self.ticks = 0
+        self.runs = 0
+        self.dropped = 0
+
+        self._instruments = {}  # name: _Instrument
+        self._by_key = {}       # stream key: [_Instrument]
+
+    def subscribe(self, name, price, inputs):
+        """
+        Reprice name on any tick of its inputs
+        ==============================
+        Args:
+            name (str): instrument
+            price (callable): price(**arguments) -> float (picklable if
+                the executor is a process pool, see equity_option / cap)
+            inputs (dict): argument of price: stream key
+        """
+        inst = _Instrument(name, price, inputs)
+        self._instruments[name] = inst
+        for key in inputs.values():
+            self._by_key.setdefault(key, []).append(inst)
+
+        if all(key in self.state for key in inputs.values()):
+            inst.since = time.perf_counter()
+            self._schedule(inst)
+
+    def unsubscribe(self, name):
+        inst = self._instruments.pop(name)
+        for key in inst.inputs.values():
+            self._by_key[key].remove(inst)
+        if inst.task is not None:
+            inst.task.cancel()
+        self.latest.pop(name, None)
+
+    def tick(self, key, value):
+        """
+        New value of a stream (spot, vol, rate, ZCB curve, ...)
+        """
+        now = time.perf_counter()
+        self.state[key] = value
+        self.ticks += 1
+
+        for inst in self._by_key.get(key, ()):
+            inst.version += 1
+            if inst.since is None:
+                inst.since = now
+            self._schedule(inst)
+
+    async def consume(self, queue):
+        """
+        Feed (key, value) ticks from an asyncio.Queue until None,
+        then wait for the pricings in flight
+        """
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            self.tick(*item)
+
+        await self.drain()
+
+    async def drain(self):
+        """
+        Wait until every instrument is up to date
+        """
+        tasks = [i.task for i in self._instruments.values()
+                 if i.task is not None and not i.task.done()]
+        while tasks:
+            await asyncio.gather(*tasks)
+            tasks = [i.task for i in self._instruments.values()
+                     if i.task is not None and not i.task.done()]
+
+    def percentiles(self, q=(50, 90, 99)):
+        """
+        Latency percentiles (seconds) over the last publications
+        """
+        if not self.latency:
+            return {}
+
+        latency = np.fromiter(self.latency, dtype=float)
+        stats = {"p{}".format(k): v for k, v in zip(q, np.percentile(latency, q))}
+        stats["max"] = latency.max()
+        stats["count"] = len(latency)
+        return stats
+
+    def stats(self):
+        """
+        Counters: ticks received, pricings run, stale results dropped,
+        prices published
+        """
+        return {"ticks": self.ticks, "runs": self.runs, "dropped": self.dropped,
+                "published": len(self.latency)}
+
+    def _schedule(self, inst):
+        if inst.task is not None and not inst.task.done():
+            return  # in flight: picks up the new version when it returns
+        if all(key in self.state for key in inst.inputs.values()):
+            inst.task = asyncio.get_running_loop().create_task(self._reprice(inst))
+
+    async def _reprice(self, inst):
+        loop = asyncio.get_running_loop()
+        since = None  # oldest tick not yet published
+        drops = 0
+
+        while True:
+            if self.window:
+                await asyncio.sleep(self.window)
+
+            # snapshot: later ticks set inst.since again
+            version = inst.version
+            since = inst.since if since is None else since
+            inst.since = None
+            arguments = {arg: self.state[key] for arg, key in inst.inputs.items()}
+
+            self.runs += 1
+            try:
+                value = await loop.run_in_executor(
+                    self.executor, functools.partial(inst.price, **arguments))
+            except Exception as exc:
+                if inst.version != version:
+                    continue  # inputs moved, try again on the new ones
+                self.errors[inst.name] = exc
+                return
+
+            if inst.version == version:
+                self._publish(inst, value, since)
+                return
+
+            # newer tick: stale, price again on the latest inputs
+            drops += 1
+            if self.max_drops is None or drops <= self.max_drops:
+                self.dropped += 1
+                continue
+
+            self._publish(inst, value, since)
+            since, drops = None, 0
+
+    def _publish(self, inst, value, since):
+        self.latest[inst.name] = value
+        self.latency.append(time.perf_counter() - since)
+        if self.callback is not None:
+            self.callback(inst.name, value)
+
+
+class _Instrument:
+    __slots__ = ("name", "price", "inputs", "version", "since", "task")
+
+    def __init__(self, name, price, inputs):
+        self.name = name
+        self.price = price
+        self.inputs = inputs
+        self.version = 0    # number of input ticks received
+        self.since = None   # time of the first tick not yet priced
+        self.task = None    # pricing in flight
+
+
+def equity_option(strike, T, n=200, style="american", otype="put", t=0.0):
+    """
+    Pricer of stock, vol, rate (and dividend) using a price-only
+    BinomialTree (picklable, e.g. for a process pool)
+    """
+    return functools.partial(_equity_option, strike=strike, t=t, T=T, n=n,
+                             style=style, otype=otype)
+
+
+def _equity_option(stock, vol, rate, dividend=0.0, *, strike, t, T, n, style, otype):
+    tree = BinomialTree(Parameters(stock, strike, t, T, rate, dividend, vol), n,
+                        price_only=True)
+    if style == "european":
+        tree.set_european()
+        return tree.eu_c if otype == "call" else tree.eu_p
+
+    tree.set_american()
+    return tree.am_c if otype == "call" else tree.am_p
+
+
+def cap(T, n, c, sigma, model="BlackDermanToy", notional=100.0, otype="cap"):
+    """
+    Pricer of a ZCB curve (one price per step T/n, at least n+1 of them):
+    cap / floor / swap priced with Option_IR on a forward-calibrated
+    HoLee / BlackDermanToy tree
+    """
+    return functools.partial(_cap, T=T, n=n, c=c, sigma=sigma, model=model,
+                             notional=notional, otype=otype)
+
+
+def _cap(zcb, *, T, n, c, sigma, model, notional, otype):
+    cls = {"HoLee": HoLee, "BlackDermanToy": BlackDermanToy}[model]
+
+    zcb = np.asarray(zcb, dtype=float)
+    rate_obj = cls(zcb, T / n * zcb.shape[-1], sigma, method="forward")
+
+    return Option_IR(rate_obj, T, n).option(c, notional, otype)[0, 0]
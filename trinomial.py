@@ -0,0 +1,166 @@
+import numpy as np
+
+import instrument
+
+
+class TrinomialTree:
+    """
+    Class Trinomial tree.
+    Kamrad and Ritchken (1991) methodology
+
+    --------------------------------
+    Note:
+        Same input (Parameters) and outputs as crr.BinomialTree:
+        obj.set_european() / obj.set_american() set eu_c, eu_p,
+        am_c, am_p and the trees t_stock, t_eu_c, t_eu_p, t_am_c, t_am_p.
+
+        Each node moves up (S u), stays (S) or moves down (S / u):
+            u = exp(lam sigma sqrt(dt))
+            pu = 1/(2 lam^2) + (r - sigma^2/2) sqrt(dt) / (2 lam sigma)
+            pm = 1 - 1/lam^2
+            pd = 1/(2 lam^2) - (r - sigma^2/2) sqrt(dt) / (2 lam sigma)
+        lam = sqrt(3/2) by default. As in BinomialTree, the dividend
+        is not part of the drift.
+
+        Column i has 2i+1 rows (row j <=> S u^(i-j)): trees are dense
+        (2n+1)x(n+1) arrays, zeros outside, e.g. for
+        GraphTree(obj.t_stock, branches=3).
+
+    Price only:
+        obj = TrinomialTree(param, n, price_only=True)
+        keeps a single rolling column of option values (O(n) memory).
+    """
+
+    def __init__(self, param, n, price_only=False, lam=np.sqrt(1.5)):
+        self.param = param      # Parameter object
+        self.n = n              # number of timestep
+        self.price_only = price_only  # rolling column, no full tree
+        self.lam = lam          # stretch parameter (>= 1)
+
+        self.dt = self.param.tau / self.n
+
+        self.u = 0 # up movement
+        self.d = 0 # down movement
+
+        # probabilities: up, middle, down
+        self.pu = 0
+        self.pm = 0
+        self.pd = 0
+
+        # Full stock tree only allocated when needed
+        self.t_stock = 0
+
+        # set European and Amerian option
+        self.t_eu_c = 0
+        self.t_eu_p = 0
+        self.t_am_c = 0
+        self.t_am_p = 0
+
+        # Option prices at time 0
+        self.eu_c = np.nan
+        self.eu_p = np.nan
+        self.am_c = np.nan
+        self.am_p = np.nan
+
+        self.set_kr() # Kamrad-Ritchken
+
+    def set_kr(self):
+        """
+        Set parameter according to the Kamrad and Ritchken (1991) model
+        """
+        vol = self.param.vol
+        self.u = np.exp(self.lam * vol * np.sqrt(self.dt)) # up
+        self.d = 1/self.u # down
+
+        drift = (self.param.rate - vol**2 / 2) * np.sqrt(self.dt) / (2 * self.lam * vol)
+        self.pu = 1 / (2 * self.lam**2) + drift
+        self.pm = 1 - 1 / self.lam**2
+        self.pd = 1 / (2 * self.lam**2) - drift
+
+        if min(self.pu, self.pm, self.pd) < 0:
+            raise ValueError("negative probability (pu, pm, pd) = ({}, {}, {}): "
+                             "increase n or lam".format(self.pu, self.pm, self.pd))
+
+    @instrument.timed
+    def set_tree(self):
+        """
+        Dense (2n+1)x(n+1) stock tree
+        """
+        tree = np.zeros((2*self.n + 1, self.n + 1))
+        for i in range(self.n + 1):
+            tree[:2*i+1, i] = self.stock_column(i)
+
+        instrument.alloc("TrinomialTree.t_stock", tree.nbytes)
+        self.t_stock = tree
+
+    def stock_column(self, i):
+        """
+        Stock price at time step i (2i+1 rows, row j <=> S u^(i-j))
+        """
+        return self.param.stock * self.u**np.arange(i, -i-1, -1)
+
+    @instrument.timed
+    def set_european(self):
+        """
+        Set European Call and Put option
+        """
+        self._backward(american=False)
+
+    @instrument.timed
+    def set_american(self):
+        """
+        Set American call and put option
+        """
+        self._backward(american=True)
+
+    def _backward(self, american):
+        """
+        Backward induction, vectorised over each column:
+            V[j, i] = exp(-r dt) (pu V[j, i+1] + pm V[j+1, i+1] + pd V[j+2, i+1])
+        (max with the exercise value if american). Price only: a single
+        rolling column, column i overwrites the first 2i+1 values.
+        """
+        disc = np.exp(-self.param.rate * self.dt)
+        K = self.param.strike
+        n = self.n
+
+        if not self.price_only:
+            if not isinstance(self.t_stock, np.ndarray):
+                self.set_tree()
+            t_call = np.zeros_like(self.t_stock)
+            t_put = np.zeros_like(self.t_stock)
+            instrument.alloc("TrinomialTree.t_option", 2 * t_call.nbytes)
+
+        stock = self.stock_column(n)
+        call = np.maximum(stock - K, 0.0)
+        put = np.maximum(K - stock, 0.0)
+
+        if not self.price_only:
+            t_call[:, n] = call
+            t_put[:, n] = put
+
+        for i in range(n-1, -1, -1):
+            m = 2*i + 1 # rows of column i
+
+            call[:m] = disc * (self.pu * call[:m] + self.pm * call[1:m+1]
+                               + self.pd * call[2:m+2])
+            put[:m] = disc * (self.pu * put[:m] + self.pm * put[1:m+1]
+                              + self.pd * put[2:m+2])
+
+            if american:
+                stock = stock[1:m+1] # same price one row down
+                call[:m] = np.maximum(stock - K, call[:m])
+                put[:m] = np.maximum(K - stock, put[:m])
+
+            if not self.price_only:
+                t_call[:m, i] = call[:m]
+                t_put[:m, i] = put[:m]
+
+        if american:
+            self.am_c, self.am_p = call[0], put[0]
+            if not self.price_only:
+                self.t_am_c, self.t_am_p = t_call, t_put
+        else:
+            self.eu_c, self.eu_p = call[0], put[0]
+            if not self.price_only:
+                self.t_eu_c, self.t_eu_p = t_call, t_put